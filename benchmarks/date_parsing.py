@@ -0,0 +1,43 @@
+"""
+Compare `datetime.strptime` with the cached date parsers on a million statement dates.
+
+Run from the repository root: `python -m benchmarks.date_parsing`
+"""
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from parsers.dates import parse_month_day_year, parse_year_month_day
+
+NUM_ROWS = 1_000_000
+NUM_DISTINCT_DATES = 730
+
+
+def create_date_strings(date_format: str) -> list[str]:
+    """Create `NUM_ROWS` date strings drawn from `NUM_DISTINCT_DATES` consecutive days."""
+    start = date(2020, 1, 1)
+    distinct = [(start + timedelta(days=offset)).strftime(date_format) for offset in range(NUM_DISTINCT_DATES)]
+    return random.choices(distinct, k=NUM_ROWS)
+
+
+def time_parser(parse, date_strings: list[str]) -> float:
+    """Get the number of seconds `parse` takes to decode every string in `date_strings`."""
+    start = time.perf_counter()
+    for date_str in date_strings:
+        parse(date_str)
+    return time.perf_counter() - start
+
+
+def run_benchmark(name: str, date_format: str, fast_parse):
+    date_strings = create_date_strings(date_format)
+    fast_parse.cache_clear()
+    strptime_seconds = time_parser(lambda date_str: datetime.strptime(date_str, date_format), date_strings)
+    fast_seconds = time_parser(fast_parse, date_strings)
+    print(f'{name}: strptime {strptime_seconds:.3f}s, cached {fast_seconds:.3f}s, '
+          f'{strptime_seconds / fast_seconds:.1f}x faster')
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    run_benchmark('bank (%Y/%m/%d)', '%Y/%m/%d', parse_year_month_day)
+    run_benchmark('credit card (%m/%d/%Y)', '%m/%d/%Y', parse_month_day_year)
@@ -0,0 +1,53 @@
+from typing import Dict, Iterable, Tuple
+
+
+class CategoryRegistry:
+    """
+    Assigns every `(major_category, minor_category)` pair from the config a compact integer id.
+    Ids follow config order and can be looked up from either direction in constant time.
+    """
+
+    def __init__(self, default_values: Dict[str, Dict[str, float]]):
+        self.default_values = default_values
+        self.categories: list[Tuple[str, str]] = [
+            (major, minor) for major in default_values.keys() for minor in default_values[major].keys()]
+        self.ids: Dict[Tuple[str, str], int] = {}
+        self.minor_ids: Dict[str, int] = {}
+        self.major_ids: Dict[str, list[int]] = {major: [] for major in default_values.keys()}
+        self.minor_id_maps: Dict[str, Dict[str, int]] = {major: {} for major in default_values.keys()}
+        for category_id, (major, minor) in enumerate(self.categories):
+            self.ids[(major, minor)] = category_id
+            # the first major category wins when a minor category name is repeated
+            self.minor_ids.setdefault(minor, category_id)
+            self.major_ids[major].append(category_id)
+            self.minor_id_maps[major][minor] = category_id
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def get_id(self, major_category: str, minor_category: str) -> int:
+        """Get the id of the given categories."""
+        return self.ids[(major_category, minor_category)]
+
+    def get_id_for_minor(self, minor_category: str) -> int | None:
+        """Get the id of the first category whose minor category is `minor_category`."""
+        return self.minor_ids.get(minor_category)
+
+    def get_ids(self, major_category: str) -> list[int]:
+        """Get the ids of every minor category of `major_category`."""
+        return self.major_ids[major_category]
+
+    def get_minor_id_map(self, major_category: str) -> Dict[str, int]:
+        """Get the `{ minor_category: id }` map of `major_category`. It is shared and must not be modified."""
+        return self.minor_id_maps[major_category]
+
+    def get_category(self, category_id: int) -> Tuple[str, str]:
+        """Get the `(major_category, minor_category)` of `category_id`."""
+        return self.categories[category_id]
+
+    def to_category_map(self, values: Iterable[int]) -> Dict[str, Dict[str, int]]:
+        """Convert per-id `values` into a `{ major_category: { minor_category: value } }` map."""
+        category_map = {major: {} for major in self.default_values.keys()}
+        for (major, minor), value in zip(self.categories, values):
+            category_map[major][minor] = value
+        return category_map
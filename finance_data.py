@@ -1,33 +1,72 @@
-import copy
 import json
 from calendar import monthrange
-from datetime import datetime
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Mapping, Tuple
+
+from categories import CategoryRegistry
+from range_index import DayRangeIndex
+from views import TimespanView
+
+# (year, month, day)
+Date = Tuple[int, int, int]
+
+CENTS_PER_DOLLAR = 100
+
+
+def cents_to_dollars(cents: int) -> float:
+    """Convert an amount in integer cents to dollars for output."""
+    return cents / CENTS_PER_DOLLAR
 
 
 class FinanceData:
     """
     Object used to store all parsed finance data.
+    Values are integer cents and categories are stored by their id in `registry`.
+    Monthly, yearly and overall totals are kept as a rollup that `add_category_value` updates,
+    so the aggregate getters never rescan the daily values.
+    Totals over arbitrary date ranges come from a Fenwick tree index that is updated the same way.
+    Days and categories are only stored once a value is added to them, readers fill in zeros for the rest.
+    Each month counts the values added to it, so it exists for as long as it has values, even if they sum to zero,
+    and only subtracting all of them drops it.
     Structure of data:
     {
         year: {
             month: {
                 day: {
-                    major_category: {
-                        minor_category: value
-                    }
+                    category_id: value
                 }
             }
         }
     }
     """
 
+    # whether each transaction is kept along with its file, which a snapshot of the totals cannot restore
+    keeps_transactions = False
+
     def __init__(self, default_values: Dict[str, Dict[str, float]]):
         self.data = {}
         self.default_values = default_values
+        self.registry = CategoryRegistry(default_values)
+        # rollup of per category totals: year -> month -> totals, year -> totals, all time totals
+        self.monthly_totals: Dict[int, Dict[int, list[int]]] = {}
+        self.yearly_totals: Dict[int, list[int]] = {}
+        self.overall_totals: list[int] = [0] * len(self.registry)
+        # per category totals over any range of days
+        self.range_index = DayRangeIndex(len(self.registry))
+        # number of values added to each month: year -> month -> count
+        self.month_counts: Dict[int, Dict[int, int]] = {}
 
     def __str__(self):
-        return json.dumps(self.data, indent=4)
+        named_data = {
+            year: {
+                month: {
+                    day: self.get_named_values(day_values)
+                    for day, day_values in self.data[year][month].items()
+                }
+                for month in self.data[year].keys()
+            }
+            for year in self.data.keys()
+        }
+        return json.dumps(named_data, indent=4)
 
     def get_years(self) -> list[str]:
         """Get a `list` of years."""
@@ -50,84 +89,171 @@ class FinanceData:
 
     def get_major_category(self, minor_category: str) -> str:
         """Get the major category associated with the given `minor_category`."""
-        for major_category in self.default_values.keys():
-            if minor_category in self.default_values[major_category].keys():
-                return major_category
-        return None
+        category_id = self.registry.get_id_for_minor(minor_category)
+        if category_id is None:
+            return None
+        major_category, _ = self.registry.get_category(category_id)
+        return major_category
 
-    def get_overall(self) -> Dict[str, Dict[str, float]]:
+    def get_overall(self) -> Dict[str, Dict[str, int]]:
         """Get totals for each major and minor category for all time."""
-        totals = copy.deepcopy(self.default_values)
-        for year in self.data.keys():
-            for month in self.data[year].keys():
-                for day in self.data[year][month].keys():
-                    for major in self.data[year][month][day].keys():
-                        for minor in self.data[year][month][day][major].keys():
-                            totals[major][minor] += self.data[year][month][day][major][minor]
-                            totals[major][minor] = round(totals[major][minor], 2)
-        return totals
-
-    def get_yearly_overall(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        return self.registry.to_category_map(self.overall_totals)
+
+    def get_yearly_overall(self) -> Dict[str, Dict[str, Dict[str, int]]]:
         """Get the totals for each major and minor category for every year in this data."""
-        yearly_totals = {}
-        for year in self.data.keys():
-            yearly_totals[year] = copy.deepcopy(self.default_values)
-            for month in self.data[year].keys():
-                for day in self.data[year][month].keys():
-                    for major in self.data[year][month][day].keys():
-                        for minor in self.data[year][month][day][major].keys():
-                            yearly_totals[year][major][minor] += self.data[year][month][day][major][minor]
-                            yearly_totals[year][major][minor] = round(yearly_totals[year][major][minor], 2)
-        return yearly_totals
-
-    def get_monthly_overall(self, year: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+        return {year: self.registry.to_category_map(self.yearly_totals[year]) for year in self.data.keys()}
+
+    def get_monthly_overall(self, year: str) -> Dict[str, Dict[str, Dict[str, int]]]:
         """Get the totals for each major and minor category for every month in this data."""
-        monthly_totals = {}
-        for month in self.data[year].keys():
-            month_key = f'{year}/{month}'
-            monthly_totals[month_key] = copy.deepcopy(self.default_values)
-            for day in self.data[year][month].keys():
-                for major in self.data[year][month][day].keys():
-                    for minor in self.data[year][month][day][major].keys():
-                        monthly_totals[month_key][major][minor] += self.data[year][month][day][major][minor]
-                        monthly_totals[month_key][major][minor] = round(monthly_totals[month_key][major][minor], 2)
-        return monthly_totals
-
-    def get_monthly_expenses(self, year: str) -> Dict[str, Dict[str, float]]:
-        """Get the contents of the expenses category for every month of the given year."""
-        default_expenses_values = self.default_values['expenses']
-        monthly_expenses_totals = {}
-        for month in self.data[year].keys():
-            month_key = f'{year}/{month}'
-            monthly_expenses_totals[month_key] = copy.deepcopy(default_expenses_values)
-            for day in self.data[year][month].keys():
-                for minor in self.data[year][month][day]['expenses'].keys():
-                    monthly_expenses_totals[month_key][minor] += self.data[year][month][day]['expenses'][minor]
-                    monthly_expenses_totals[month_key][minor] = round(monthly_expenses_totals[month_key][minor], 2)
-        return monthly_expenses_totals
-
-    def get_daily_expenses(self, year: str, month: str) -> Dict[str, Dict[str, float]]:
-        """Get the contents of the expenses category for every day of a given month and year."""
-        daily_expenses_map = copy.deepcopy(self.data[year][month])
-        for day in daily_expenses_map.keys():
-            daily_expenses_map[day] = daily_expenses_map[day]['expenses']
-        return daily_expenses_map
-
-    def add_value(self, date: datetime, major_category: str, minor_category: str, amount: float):
-        """Add an amount to the current value for the given date and categories."""
+        return {f'{year}/{month}': self.registry.to_category_map(self.monthly_totals[year][month])
+                for month in self.data[year].keys()}
+
+    def get_monthly_expenses(self, year: str) -> Mapping[str, Mapping[str, int]]:
+        """Get a read-only view of the contents of the expenses category for every month of the given year."""
+        return TimespanView(self.registry.get_minor_id_map('expenses'),
+                            {f'{year}/{month}': self.monthly_totals[year][month] for month in self.data[year].keys()})
+
+    def get_range_totals(self, start_date: Date, end_date: Date) -> Dict[str, Dict[str, int]]:
+        """Get the totals for each major and minor category between `start_date` and `end_date`, both inclusive."""
+        return self.registry.to_category_map(self.range_index.get_totals(start_date, end_date))
+
+    def get_daily_expenses(self, year: str, month: str) -> Mapping[int, Mapping[str, int]]:
+        """Get a read-only view of the contents of the expenses category for every day of a given month and year."""
+        month_data = self.data[year][month]
+        _, num_days = monthrange(year, month)
+        # days without values share one empty mapping, the view reads their values as zeros
+        empty_day = {}
+        return TimespanView(self.registry.get_minor_id_map('expenses'),
+                            {day: month_data.get(day, empty_day) for day in range(1, num_days + 1)})
+
+    def get_named_values(self, day_values: Dict[int, int]) -> Dict[str, Dict[str, int]]:
+        """Convert id keyed `day_values` into a `{ major_category: { minor_category: value } }` map."""
+        named_values = {}
+        for category_id, value in day_values.items():
+            major, minor = self.registry.get_category(category_id)
+            named_values.setdefault(major, {})[minor] = value
+        return named_values
+
+    def add_value(self, date: Date, major_category: str, minor_category: str, amount: int):
+        """Add an amount in cents to the current value for the given date and categories."""
+        self.add_category_value(date, self.registry.get_id(major_category, minor_category), amount)
+
+    def add_category_value(self, date: Date, category_id: int, amount: int):
+        """Add an amount in cents to the current value for the given date and category id, as one more value."""
+        self.add_amount(date, category_id, amount)
+        year, month, _ = date
+        self.month_counts[year][month] += 1
+
+    def add_amount(self, date: Date, category_id: int, amount: int):
+        """Add an amount in cents to the current value for the given date and category id, without counting it."""
         self.add_date_if_not_exists(date)
-        self.data[date.year][date.month][date.day][major_category][minor_category] += amount
+        year, month, day = date
+        day_values = self.data[year][month].setdefault(day, {})
+        day_values[category_id] = day_values.get(category_id, 0) + amount
+        self.monthly_totals[year][month][category_id] += amount
+        self.yearly_totals[year][category_id] += amount
+        self.overall_totals[category_id] += amount
+        self.range_index.add(date, category_id, amount)
+
+    def add_transactions(self, transactions: Iterable) -> 'FinanceData':
+        """Add the value of each classified transaction from the parsing pipeline."""
+        for transaction in transactions:
+            self.add_category_value(transaction.date, transaction.category_id, transaction.value)
+        return self
+
+    def merge(self, other: 'FinanceData') -> 'FinanceData':
+        """Add every value in `other` to this data. Returns this object so merges can be chained."""
+        for year, month, count in other.get_month_counts():
+            self.add_month_count(year, month, count)
+        for year in other.data.keys():
+            for month in other.data[year].keys():
+                for day, day_values in other.data[year][month].items():
+                    for category_id, value in day_values.items():
+                        self.add_amount((year, month, day), category_id, value)
+        return self
+
+    def subtract(self, other: 'FinanceData') -> 'FinanceData':
+        """Remove every value in `other` from this data. Months left without any of their values are dropped."""
+        for year in other.data.keys():
+            for month in other.data[year].keys():
+                for day, day_values in other.data[year][month].items():
+                    for category_id, value in day_values.items():
+                        self.add_amount((year, month, day), category_id, -value)
+        for year, month, count in other.get_month_counts():
+            self.add_month_count(year, month, -count)
+        return self
+
+    def get_month_counts(self) -> list[Tuple[int, int, int]]:
+        """Get the `(year, month, count)` of every month, in the order of `get_months`."""
+        return [(year, month, count)
+                for year, month_counts in self.month_counts.items()
+                for month, count in month_counts.items()]
+
+    def add_month_count(self, year: int, month: int, count: int):
+        """Add `count` values to a month without changing its totals. The month is removed once none are left."""
+        self.add_date_if_not_exists((year, month, 1))
+        self.month_counts[year][month] += count
+        if self.month_counts[year][month] <= 0:
+            self.remove_month(year, month)
+
+    def remove_file(self, file_path: str, contribution: 'FinanceData'):
+        """Remove the previously added `contribution` of the statement file at `file_path`."""
+        self.subtract(contribution)
 
-    def add_date_if_not_exists(self, date: datetime):
+    def has_snapshot(self, snapshot_id: str) -> bool:
+        """Check whether this data already holds the state saved as `snapshot_id`, so it needs nothing loaded."""
+        return False
+
+    def set_snapshot(self, snapshot_id: str):
+        """Remember that this data holds the state saved as `snapshot_id`. In-memory data does not outlive a run."""
+
+    def clear(self):
+        """Remove every value."""
+        self.__init__(self.default_values)
+
+    def close(self):
+        """Release anything the storage holds on to. Nothing to do for in-memory data."""
+
+    def remove_month(self, year: int, month: int):
+        """Remove a month whose values were all subtracted, and its year once it has no months left."""
+        del self.data[year][month]
+        del self.monthly_totals[year][month]
+        del self.month_counts[year][month]
+        if not self.data[year]:
+            del self.data[year]
+            del self.monthly_totals[year]
+            del self.yearly_totals[year]
+            del self.month_counts[year]
+
+    def get_entries(self) -> list[Tuple[Date, str, str, int]]:
+        """
+        Get every non-zero value as a `(date, major_category, minor_category, value)` tuple.
+        Entries follow the order years and months were added in, so `add_entries` recreates the same order.
+        """
+        return [((year, month, day), *self.registry.get_category(category_id), value)
+                for year in self.data.keys()
+                for month in self.data[year].keys()
+                for day in self.data[year][month].keys()
+                for category_id, value in self.data[year][month][day].items()
+                if value]
+
+    def add_entries(self, entries: list[Tuple[Date, str, str, int]]) -> 'FinanceData':
+        """Add each `(date, major_category, minor_category, value)` tuple in `entries`."""
+        for date, major_category, minor_category, value in entries:
+            self.add_value(tuple(date), major_category, minor_category, value)
+        return self
+
+    def add_date_if_not_exists(self, date: Date):
         """Add a new date if it does not already exist in data."""
+        year, month, _ = date
         # create new year
-        if date.year not in self.data.keys():
-            self.data[date.year] = {}
-        # create new month
-        if date.month not in self.data[date.year].keys():
-            # populate each day of the month with default values
-            _, num_days = monthrange(date.year, date.month)
-            self.data[date.year][date.month] = {
-                day: copy.deepcopy(self.default_values)
-                for day in range(1, num_days + 1)
-            }
+        if year not in self.data.keys():
+            self.data[year] = {}
+            self.monthly_totals[year] = {}
+            self.yearly_totals[year] = [0] * len(self.registry)
+            self.month_counts[year] = {}
+        # create new month, days are added by `add_value` as values arrive
+        if month not in self.data[year].keys():
+            self.data[year][month] = {}
+            self.monthly_totals[year][month] = [0] * len(self.registry)
+            self.month_counts[year][month] = 0
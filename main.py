@@ -1,10 +1,17 @@
 import copy
 import json
-from typing import Dict, List, Tuple
+import os
+from typing import Dict, List
 
+from finance_data import FinanceData
 from parsers.bank_parser import parse_bank_data
+from parsers.classification_cache import ClassificationCache
 from parsers.credit_card_parser import parse_credit_card_data
-from finance_data import FinanceData
+from parsers.dedup import DedupIndex
+from parsers.ingestion import list_files
+from parsers.manifest import Manifest
+from parsers.rules import SUBSTRING, Rule, RuleClassifier, create_rule
+from storage.files import get_file_fingerprint
 from writer import create_xlsx_file
 from writers.styles import Styles
 
@@ -15,6 +22,7 @@ Config Type Structure
         minor_category: {
             description: 'description'
             substrings: ['substring 1', 'substring 2']
+            rules: [{ regex: 'pattern', min_amount: 10.00, transaction_type: 'DEBIT' }]
             styles: {
                 cell_type: {
                     property: value
@@ -24,25 +32,68 @@ Config Type Structure
     }
 }
 """
-Config = Dict[str, Dict[str, Dict[str, str | list[str] | Dict[str, Dict[str, str]]]]]
+Config = Dict[str, Dict[str, Dict[str, str | list[str] | list[dict] | Dict[str, Dict[str, str]]]]]
 
 CONFIG_FILE = './config/config.json'
 BANK_ACTIVITY_DIR = './bank_activity'
 CREDIT_CARD_ACTIVITY_DIR = './credit_card_activity'
+CLASSIFICATION_CACHE_FILE = './cache/classification_cache'
+MANIFEST_FILE = './cache/manifest.json'
+SNAPSHOT_FILE = './cache/finance_data.snapshot'
+CONTRIBUTIONS_DIR = './cache/contributions'
+# skip transactions already ingested from an overlapping statement export
+DEDUPLICATE_TRANSACTIONS = True
+DEDUP_INDEX_FILE = './cache/dedup_index'
+LEDGER_FILE = './cache/ledger.sqlite3'
+# 'dict' keeps data in nested dicts, 'columnar' keeps it in a NumPy array,
+# 'sqlite' keeps a transaction ledger in `LEDGER_FILE`
+STORAGE_BACKEND = 'dict'
+# number of processes used to parse statement files, 1 parses everything in this process
+INGESTION_WORKERS = os.cpu_count() or 1
 
 
 def main():
     config = load_config_file(CONFIG_FILE)
     default_values = create_default_value_map(config)
-    substring_map = create_substring_map(config)
+    rules = create_rules(config)
     description_map = create_description_map(config)
     custom_styles = create_custom_styles_map(config)
-    finance_data = FinanceData(default_values)
-
-    parse_bank_data(finance_data, substring_map, BANK_ACTIVITY_DIR)
-    parse_credit_card_data(finance_data, substring_map, CREDIT_CARD_ACTIVITY_DIR)
+    config_fingerprint = get_file_fingerprint(CONFIG_FILE)
+
+    # start from the totals of the previous run and only parse files that changed since then,
+    # the recorded contributions depend on whether duplicates were skipped
+    manifest = Manifest(MANIFEST_FILE, f'{config_fingerprint}:{DEDUPLICATE_TRANSACTIONS}', default_values,
+                        SNAPSHOT_FILE, CONTRIBUTIONS_DIR)
+    finance_data = manifest.load_finance_data(create_finance_data(default_values))
+    dedup_index = None
+    if DEDUPLICATE_TRANSACTIONS:
+        dedup_index = DedupIndex(DEDUP_INDEX_FILE)
+        if not dedup_index.is_loaded:
+            # without the index it is unknown which transactions the recorded files skipped, parse them all again
+            for file_path in manifest.files.keys():
+                manifest.invalidate(file_path)
+        dedup_index.retain(manifest.files.keys())
+
+    statement_files = list_files(BANK_ACTIVITY_DIR) + list_files(CREDIT_CARD_ACTIVITY_DIR)
+    for file_path, contribution in manifest.pop_missing_contributions(statement_files).items():
+        manifest.load_years(finance_data, contribution.get_years())
+        finance_data.remove_file(file_path, contribution)
+        # files that skipped transactions of a removed file have to count them again
+        for dependent in dedup_index.release(file_path) if dedup_index else ():
+            manifest.invalidate(dependent)
+
+    with ClassificationCache(RuleClassifier(rules, finance_data.registry), config_fingerprint,
+                             CLASSIFICATION_CACHE_FILE) as classifier:
+        parse_bank_data(finance_data, classifier, BANK_ACTIVITY_DIR, INGESTION_WORKERS, manifest=manifest,
+                        dedup_index=dedup_index)
+        parse_credit_card_data(finance_data, classifier, CREDIT_CARD_ACTIVITY_DIR, INGESTION_WORKERS,
+                               manifest=manifest, dedup_index=dedup_index)
+    manifest.save(finance_data)
+    if dedup_index:
+        dedup_index.save()
 
     create_xlsx_file(finance_data, custom_styles, description_map)
+    finance_data.close()
 
 
 def load_config_file(config_file: str) -> Config:
@@ -51,6 +102,18 @@ def load_config_file(config_file: str) -> Config:
         return json.load(config_json)
 
 
+def create_finance_data(default_values: Dict[str, Dict[str, float]]) -> FinanceData:
+    """Create an empty `FinanceData` using the storage selected by `STORAGE_BACKEND`."""
+    if STORAGE_BACKEND == 'columnar':
+        # numpy is only needed by this backend
+        from storage.columnar import ColumnarFinanceData
+        return ColumnarFinanceData(default_values)
+    if STORAGE_BACKEND == 'sqlite':
+        from storage.sqlite_ledger import SqliteFinanceData
+        return SqliteFinanceData(default_values, LEDGER_FILE)
+    return FinanceData(default_values)
+
+
 def create_default_value_map(config: Config) -> Dict[str, Dict[str, float]]:
     """Create a `dict` that maps all categories in `config` to zeros."""
     default_values = copy.deepcopy(config)
@@ -60,12 +123,15 @@ def create_default_value_map(config: Config) -> Dict[str, Dict[str, float]]:
     return default_values
 
 
-def create_substring_map(config: Config) -> List[Tuple[str, str, str]]:
-    """Create a `list` of all substrings in `config` tupled with their categories."""
-    return [(major, minor, substring.lower())
-            for major in config
-            for minor in config[major]
-            for substring in config[major][minor]['substrings']]
+def create_rules(config: Config) -> List[Rule]:
+    """Create a `list` of the substrings and rules of every category in `config`, in config order."""
+    rules = []
+    for major in config:
+        for minor in config[major]:
+            rules += [Rule(major, minor, SUBSTRING, substring.lower())
+                      for substring in config[major][minor]['substrings']]
+            rules += [create_rule(major, minor, rule_config) for rule_config in config[major][minor].get('rules', [])]
+    return rules
 
 
 def create_custom_styles_map(config: Config) -> Styles:
@@ -0,0 +1,21 @@
+from decimal import Decimal, InvalidOperation
+
+from finance_data import CENTS_PER_DOLLAR
+
+
+def parse_cents(value_str: str) -> int:
+    """Parse a decimal amount such as `-12.34` into integer cents without going through `float`."""
+    whole, _, fraction = value_str.strip().partition('.')
+    digits = whole.lstrip('+-')
+    if digits.isdigit() and len(fraction) == 2 and fraction.isdigit() and len(whole) - len(digits) <= 1:
+        # fast path for the common `[-]dollars.cents` layout
+        cents = int(digits) * CENTS_PER_DOLLAR + int(fraction)
+        return -cents if whole.startswith('-') else cents
+    try:
+        amount = Decimal(value_str)
+    except InvalidOperation:
+        amount = None
+    # `inf` and `nan` are decimals too, but have no cents
+    if amount is None or not amount.is_finite():
+        raise ValueError(f"could not convert string to cents: '{value_str}'")
+    return int((amount * CENTS_PER_DOLLAR).to_integral_value())
@@ -1,97 +1,90 @@
-import csv
-import os
-from datetime import datetime
 from typing import List, Tuple
 
 from finance_data import FinanceData
+from parsers.amounts import parse_cents
+from parsers.classifier import Classifier
+from parsers.dates import parse_year_month_day
+from parsers.dedup import DedupIndex
+from parsers.formats import ColumnLayout, StatementFormat, register_format, run_statement_pipeline
+from parsers.ingestion import list_files, parse_files
+from parsers.manifest import Manifest
+from parsers.pipeline import NO_STAGES, Stages, Transaction
 
 
 def parse_bank_data(finance_data: FinanceData,
-                    substring_map: List[Tuple[str, str, str]],
-                    bank_activity_dir: str):
+                    classifier: Classifier,
+                    bank_activity_dir: str,
+                    workers: int = 1,
+                    stages: Stages = NO_STAGES,
+                    manifest: Manifest = None,
+                    dedup_index: DedupIndex = None):
     """
     Parse all transactions from files in `bank_activity_dir`.
     Add values to `finance_data` to sum all transactions of the same date and categories.
+    Files are parsed in parallel when `workers` is greater than 1.
+    Only new or changed files are parsed when a `manifest` is given.
+    Transactions already ingested from another file are skipped when a `dedup_index` is given.
     """
-    for bank_file in os.listdir(bank_activity_dir):
-        file_path = f'{bank_activity_dir}/{bank_file}'
-        parse_file(finance_data, substring_map, file_path)
+    parse_files(finance_data, classifier, list_files(bank_activity_dir), parse_file, workers, manifest, dedup_index,
+                stages)
 
 
 def parse_file(finance_data: FinanceData,
-               substring_map: List[Tuple[str, str, str]],
-               file_path: str):
-    """Parse a single credit card file."""
-    with open(file_path, 'r') as f:
-        reader = csv.reader(f)
-        for index, row in enumerate(reader):
-            parse_row(finance_data, substring_map, file_path, index, row)
+               classifier: Classifier,
+               file_path: str,
+               stages: Stages = NO_STAGES):
+    """Parse a single file from the bank directory, in whichever registered format its header matches."""
+    run_statement_pipeline(finance_data, classifier, file_path, BANK_FORMAT, stages)
 
 
-def parse_row(finance_data: FinanceData,
-              substring_map: List[Tuple[str, str, str]],
-              file_path: str,
-              index: int,
-              row: List[str]):
-    """Parse a row of a bank file."""
-    # skip header line
-    if index == 0:
-        return
-    date_str = None
-    desc = None
-    value_str = None
-    transaction_type = None
-    category_overwrite = None
+def parse_row(layout: ColumnLayout, file_path: str, index: int, row: List[str]) -> Transaction | None:
+    """Parse a row of a bank file with the given column `layout` into a `Transaction`."""
     row_len = len(row)
-    # parse the row differently depending on if it contains a specified category
-    if row_len == 6:
-        [date_str, value_str, desc, _, _, transaction_type] = row
-    elif row_len == 7:
-        [date_str, value_str, desc, _, _, transaction_type, category_overwrite] = row
+    # rows with a specified category have it in an extra last column
+    if row_len == layout.width:
+        category_overwrite = None
+    elif row_len == layout.width + 1:
+        category_overwrite = row[-1]
     else:
         # invalid row format
         print(row_len)
         print(f'{file_path}: line {index + 1} invalid')
-        return
+        return None
     # format row values
-    date = datetime.strptime(date_str, '%Y/%m/%d')
-    value = float(value_str)
-    
-    add_value_to_finance_data(
-        finance_data, substring_map, date, desc, value, transaction_type, category_overwrite, file_path, index)
+    date = parse_year_month_day(row[layout.date])
+    value = parse_cents(row[layout.amount])
 
+    return Transaction(date, row[layout.description], value, row[layout.transaction_type], category_overwrite,
+                       file_path, index)
 
-def add_value_to_finance_data(finance_data: FinanceData,
-                              substring_map: List[Tuple[str, str, str]],
-                              date: str,
-                              desc: str,
-                              value: float,
-                              transaction_type: str,
-                              category_overwrite: str,
-                              file_path: str,
-                              index: int):
-    """
-    Add `value` to `finance_data`.
-    Use `category_overwrite` or search for a category that matches `desc` in `substring_map`.
-    """
-    # put value into it's category
-    if category_overwrite:
-        major_category = finance_data.get_major_category(category_overwrite)
-        if major_category:
-            finance_data.add_value(date, major_category, category_overwrite, value)
-            return
-        else:
-            print(f'{file_path}: line {index + 1} has an invalid category overwrite value')
-    # check if the description contains any substrings
-    desc_lowercase = desc.lower()
-    for major, minor, substring in substring_map:
-        if substring.lower() in desc_lowercase:
-            finance_data.add_value(date, major, minor, value)
-            return
+
+def get_unknown_category(transaction: Transaction) -> Tuple[str, str]:
+    """Get the categories for a transaction whose description did not match any category."""
     # if description did not match any category, put value into other
     # assume credit = income, debit = expense
-    print(f'unknown category for {desc}')
-    if transaction_type == 'CREDIT':
-        finance_data.add_value(date, 'unknown', 'credit', value)
+    print(f'unknown category for {transaction.desc}')
+    if transaction.transaction_type == 'CREDIT':
+        return 'unknown', 'credit'
     else:
-        finance_data.add_value(date, 'unknown', 'debit', value)
+        return 'unknown', 'debit'
+
+
+def normalize_imported(transaction: Transaction) -> Transaction:
+    """Imported transactions already carry positive values and a `CREDIT` or `DEBIT` type like bank files."""
+    return transaction
+
+
+BANK_FORMAT = StatementFormat(
+    name='bank',
+    columns={
+        'date': ('date', 'posting date', 'transaction date'),
+        'description': ('description',),
+        'amount': ('amount',),
+        'transaction_type': ('type', 'transaction type'),
+    },
+    # date, amount, description, two unused columns, type
+    default_layout=ColumnLayout(width=6, date=0, description=2, amount=1, transaction_type=5),
+    parse_row=parse_row,
+    get_unknown_category=get_unknown_category,
+    normalize_imported=normalize_imported)
+register_format(BANK_FORMAT)
@@ -0,0 +1,142 @@
+import dbm
+import shelve
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+from parsers.classifier import CandidateClassifier
+from storage.files import make_parent_dir
+
+FINGERPRINT_KEY = '\0fingerprint'
+# bump when the type of the cached values changes
+CACHE_VERSION = 3
+DEFAULT_MAX_SIZE = 4096
+
+
+def normalize_description(description: str) -> str:
+    """Get the form of `description` used as a cache key."""
+    return description.lower()
+
+
+class ClassificationCache:
+    """
+    Memoizes the candidate rules of `classifier` by normalized description. The amount and transaction type
+    predicates of the candidates are checked on every lookup, so they do not multiply the entries.
+    Lookups go through a bounded in-memory LRU, then an optional on-disk shelf that persists between runs.
+    The shelf is cleared whenever `fingerprint` differs from the one it was written with.
+    A `read_only` cache, as made by `share_with_workers`, opens the shelf read-only on its first lookup and collects
+    the entries it would have added in `new_entries` instead.
+    """
+
+    def __init__(self,
+                 classifier: CandidateClassifier,
+                 fingerprint: str,
+                 cache_file: str = None,
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 read_only: bool = False):
+        self.classifier = classifier
+        self.fingerprint = fingerprint
+        self.cache_file = cache_file
+        self.max_size = max_size
+        self.read_only = read_only
+        self.lru: OrderedDict[str, Tuple[int, ...]] = OrderedDict()
+        self.shelf = open_shelf(cache_file, fingerprint) if cache_file and not read_only else None
+        self.new_entries: Dict[str, Tuple[int, ...]] = {}
+        # entries of worker copies, written to the shelf once `share_with_workers` reopens it
+        self.merged_entries: Dict[str, Tuple[int, ...]] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __getstate__(self):
+        # an open shelf cannot be pickled, a read-only copy opens its own once it is used
+        state = self.__dict__.copy()
+        state['shelf'] = None
+        return state
+
+    @contextmanager
+    def share_with_workers(self) -> Iterator['ClassificationCache']:
+        """
+        Get a read-only copy of the cache for worker processes, pass the entries they collect to `merge`.
+        The shelf is closed meanwhile, so that workers can open it for reading and do not inherit an open handle.
+        """
+        self.close()
+        try:
+            yield ClassificationCache(self.classifier, self.fingerprint, self.cache_file, self.max_size,
+                                      read_only=True)
+        finally:
+            if self.cache_file:
+                self.shelf = open_shelf(self.cache_file, self.fingerprint)
+                self.shelf.update(self.merged_entries)
+            self.merged_entries = {}
+
+    def merge(self, entries: Dict[str, Tuple[int, ...]]):
+        """Add the `new_entries` of a read-only copy."""
+        self.merged_entries.update(entries)
+
+    def pop_new_entries(self) -> Dict[str, Tuple[int, ...]]:
+        """Remove and get the entries a read-only cache collected since the last call."""
+        new_entries = self.new_entries
+        self.new_entries = {}
+        return new_entries
+
+    def classify(self, description: str, value: int = None, transaction_type: str = None) -> int | None:
+        """Get the category id for the transaction, or `None` if no rule matches."""
+        return self.classifier.choose(self.get_candidates(description), value, transaction_type)
+
+    def get_candidates(self, description: str) -> Tuple[int, ...]:
+        """Get the candidate rules of `description` from the cache, or from `classifier` on a miss."""
+        key = normalize_description(description)
+        candidates = self.lru.get(key)
+        if candidates is not None:
+            self.lru.move_to_end(key)
+            return candidates
+
+        if self.read_only and self.shelf is None and self.cache_file:
+            self.shelf = open_shelf(self.cache_file, self.fingerprint, read_only=True)
+        if self.shelf is not None:
+            candidates = self.shelf.get(key)
+        if candidates is None:
+            candidates = tuple(self.classifier.get_candidates(key))
+            if self.read_only:
+                self.new_entries[key] = candidates
+            elif self.shelf is not None:
+                self.shelf[key] = candidates
+
+        self.lru[key] = candidates
+        if len(self.lru) > self.max_size:
+            self.lru.popitem(last=False)
+        return candidates
+
+    def close(self):
+        """Flush and close the on-disk layer."""
+        if self.shelf is not None:
+            self.shelf.close()
+            self.shelf = None
+
+
+def open_shelf(cache_file: str, fingerprint: str, read_only: bool = False) -> shelve.Shelf:
+    """
+    Open the shelf at `cache_file`, recreating it if it was written for a different fingerprint.
+    A `read_only` shelf is opened for reading only, an empty one stands in for it if it is missing or outdated.
+    """
+    versioned_fingerprint = f'{CACHE_VERSION}:{fingerprint}'
+    if read_only:
+        try:
+            shelf = shelve.open(cache_file, flag='r')
+        except dbm.error:
+            return shelve.Shelf({})
+        if shelf.get(FINGERPRINT_KEY) != versioned_fingerprint:
+            shelf.close()
+            return shelve.Shelf({})
+        return shelf
+    make_parent_dir(cache_file)
+    shelf = shelve.open(cache_file)
+    if shelf.get(FINGERPRINT_KEY) != versioned_fingerprint:
+        shelf.close()
+        shelf = shelve.open(cache_file, flag='n')
+        shelf[FINGERPRINT_KEY] = versioned_fingerprint
+    return shelf
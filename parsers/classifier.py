@@ -0,0 +1,21 @@
+from typing import Protocol, Sequence
+
+
+class Classifier(Protocol):
+    """Anything that maps a transaction description, amount in cents and type to its category id."""
+
+    def classify(self, description: str, value: int = None, transaction_type: str = None) -> int | None:
+        ...
+
+
+class CandidateClassifier(Classifier, Protocol):
+    """
+    A `Classifier` that splits `classify` into a lookup that only depends on the description and a cheap check of
+    the amount and type, so the lookup can be memoized by description alone.
+    """
+
+    def get_candidates(self, description: str) -> Sequence[int]:
+        ...
+
+    def choose(self, candidates: Sequence[int], value: int = None, transaction_type: str = None) -> int | None:
+        ...
@@ -1,114 +1,105 @@
-import csv
-import os
 import re
-from datetime import datetime
 from typing import List, Tuple
 
 from finance_data import FinanceData
+from parsers.amounts import parse_cents
+from parsers.classifier import Classifier
+from parsers.dates import parse_month_day_year
+from parsers.dedup import DedupIndex
+from parsers.formats import ColumnLayout, StatementFormat, register_format, run_statement_pipeline
+from parsers.ingestion import list_files, parse_files
+from parsers.manifest import Manifest
+from parsers.pipeline import NO_STAGES, Stages, Transaction
 
 value_pattern = re.compile(r'^-?\$\d+\.\d\d$')
 positive_value_pattern = re.compile(r'^\$(\d+\.\d\d)$')
 
 
 def parse_credit_card_data(finance_data: FinanceData,
-                           substring_map: List[Tuple[str, str, str]],
-                           credit_card_activity_dir: str):
+                           classifier: Classifier,
+                           credit_card_activity_dir: str,
+                           workers: int = 1,
+                           stages: Stages = NO_STAGES,
+                           manifest: Manifest = None,
+                           dedup_index: DedupIndex = None):
     """
     Parse all transactions from files in `credit_card_activity_dir`.
     Add values to `finance_data` to sum all transactions of the same date and categories.
+    Files are parsed in parallel when `workers` is greater than 1.
+    Only new or changed files are parsed when a `manifest` is given.
+    Transactions already ingested from another file are skipped when a `dedup_index` is given.
     """
-    for credit_card_file in os.listdir(credit_card_activity_dir):
-        file_path = f'{credit_card_activity_dir}/{credit_card_file}'
-        parse_file(finance_data, substring_map, file_path)
+    parse_files(finance_data, classifier, list_files(credit_card_activity_dir), parse_file, workers, manifest,
+                dedup_index, stages)
 
 
 def parse_file(finance_data: FinanceData,
-               substring_map: List[Tuple[str, str, str]],
-               file_path: str):
-    """Parse a single credit card file."""
-    with open(file_path, 'r') as f:
-        reader = csv.reader(f)
-        for index, row in enumerate(reader):
-            parse_row(finance_data, substring_map, file_path, index, row)
-
-
-def parse_row(finance_data: FinanceData,
-              substring_map: List[Tuple[str, str, str]],
-              file_path: str,
-              index: int,
-              row: list[str]):
-    """Parse a single row of a credit card file."""
-    # skip header line
-    if index == 0:
-        return
-    date_str = None
-    desc_list = None
-    desc = None
-    value_str = None
-    category_overwrite = None
+               classifier: Classifier,
+               file_path: str,
+               stages: Stages = NO_STAGES):
+    """Parse a single file from the credit card directory, in whichever registered format its header matches."""
+    run_statement_pipeline(finance_data, classifier, file_path, CREDIT_CARD_FORMAT, stages)
+
+
+def parse_row(layout: ColumnLayout, file_path: str, index: int, row: List[str]) -> Transaction | None:
+    """Parse a single row of a credit card file with the given column `layout` into a `Transaction`."""
     row_len = len(row)
-    # parse the row differently depending on if it contains a specified category
-    # and if the description was parsed incorrectly due to containing commas
-    if row_len == 4:
-        # row has no category_overwrite and a correctly formatted description
-        date_str, desc, value_str, _ = row
-    elif row_len == 5:
-        # row could have two description entries due to containing a comma OR the row has a category_overwrite
-        date_str, desc, value_str, _, category_overwrite = row
-        value_is_valid = bool(value_pattern.match(value_str))  # check that value is not part of the description
-        if not value_is_valid:
-            # desc has multiple entires and overwrite does NOT exist
-            date_str, *desc_list, value_str, _ = row
-    elif row_len > 5:
-        # row has multiple description entires due to containing a comma AND the row has a category_overwrite
-        date_str, *desc_list, value_str, _, category_overwrite = row
+    category_overwrite = None
+    # number of extra fields the description was split into due to containing commas
+    split = 0
+    if row_len > layout.width:
+        # the extra fields are a category_overwrite in the last column and/or a description containing commas,
+        # a single extra field is the overwrite unless it shifted the value out of its column
+        if row_len > layout.width + 1 or value_pattern.match(row[layout.amount]):
+            category_overwrite = row[-1]
+        split = row_len - layout.width - (category_overwrite is not None)
     elif row_len == 1:
         # skip final row of the file
-        return
-    else:
+        return None
+    elif row_len < layout.width:
         # invalid row format
         print(f'{file_path}: line {index + 1} invalid')
-        return
+        return None
 
-    # format row values
+    # format row values, columns after the description move over by the number of extra description fields
+    value_str = row[layout.amount + split if layout.amount > layout.description else layout.amount]
     parsed_value = positive_value_pattern.match(value_str)
     if not parsed_value:
         print(f'{file_path}: line {index + 1} contains a negative value.')
-        return
-    value = float(parsed_value.group(1))
-    date = datetime.strptime(date_str.strip(), '%m/%d/%Y')
-    if desc_list:
-        desc = ','.join(desc_list)
-
-    add_value_to_finance_data(finance_data, substring_map, date, desc, value, category_overwrite, file_path, index)
-
-
-def add_value_to_finance_data(finance_data: FinanceData,
-                              substring_map: List[Tuple[str, str, str]],
-                              date: str,
-                              desc: str,
-                              value: float,
-                              category_overwrite: str,
-                              file_path: str,
-                              index: int):
-    """
-    Add `value` to `finance_data`.
-    Use `category_overwrite` or search for a category that matches `desc` in `substring_map`.
-    """
-    # put value into it's category
-    if category_overwrite:
-        major_category = finance_data.get_major_category(category_overwrite)
-        if major_category:
-            finance_data.add_value(date, major_category, category_overwrite, value)
-            return
-        else:
-            print(f'{file_path}: line {index + 1} has an invalid category overwrite value')
-    # check if the description contains any substrings
-    desc_lowercase = desc.lower()
-    for major, minor, substring in substring_map:
-        if substring.lower() in desc_lowercase:
-            finance_data.add_value(date, major, minor, value)
-            return
+        return None
+    value = parse_cents(parsed_value.group(1))
+    date_str = row[layout.date + split if layout.date > layout.description else layout.date]
+    date = parse_month_day_year(date_str.strip())
+    desc = ','.join(row[layout.description:layout.description + split + 1])
+
+    return Transaction(date, desc, value, None, category_overwrite, file_path, index)
+
+
+def get_unknown_category(transaction: Transaction) -> Tuple[str, str]:
+    """Get the categories for a transaction whose description did not match any category."""
     # if description did not match any category, put value into other expenses
-    print('unknown category for payment: ' + desc)
-    finance_data.add_value(date, 'expenses', 'unknown', value)
+    print('unknown category for payment: ' + transaction.desc)
+    return 'expenses', 'unknown'
+
+
+def normalize_imported(transaction: Transaction) -> Transaction | None:
+    """Drop imported credits such as payments, like `parse_row` drops negative values, and clear the type."""
+    if transaction.transaction_type == 'CREDIT':
+        print(f'{transaction.file_path}: line {transaction.index + 1} contains a negative value.')
+        return None
+    return transaction._replace(transaction_type=None)
+
+
+CREDIT_CARD_FORMAT = StatementFormat(
+    name='credit_card',
+    columns={
+        'date': ('date', 'transaction date', 'posted date'),
+        'description': ('description',),
+        'amount': ('amount',),
+    },
+    # date, description, amount, one unused column
+    default_layout=ColumnLayout(width=4, date=0, description=1, amount=2),
+    parse_row=parse_row,
+    get_unknown_category=get_unknown_category,
+    normalize_imported=normalize_imported)
+register_format(CREDIT_CARD_FORMAT)
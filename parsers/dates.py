@@ -0,0 +1,52 @@
+from calendar import monthrange
+from functools import lru_cache
+
+from finance_data import Date
+
+# statements only contain a few hundred distinct dates, so results are cached per date string
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_year_month_day(date_str: str) -> Date:
+    """Parse a `YYYY/MM/DD` date string into a `(year, month, day)` tuple."""
+    year, month, day = split_date(date_str)
+    return validate_date(int(year), int(month), int(day), date_str)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_month_day_year(date_str: str) -> Date:
+    """Parse a `MM/DD/YYYY` date string into a `(year, month, day)` tuple."""
+    month, day, year = split_date(date_str)
+    return validate_date(int(year), int(month), int(day), date_str)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_iso_date(date_str: str) -> Date:
+    """Parse a `YYYY-MM-DD` date string, ignoring any time after it, into a `(year, month, day)` tuple."""
+    year, month, day = split_date(date_str[:10], '-')
+    return validate_date(int(year), int(month), int(day), date_str)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_ofx_date(date_str: str) -> Date:
+    """Parse an OFX `YYYYMMDD[HHMMSS[.XXX][[offset:TZ]]]` datetime string into a `(year, month, day)` tuple."""
+    digits = date_str[:8]
+    if len(digits) != 8 or not digits.isdigit():
+        raise ValueError(f"time data '{date_str}' does not match format")
+    return validate_date(int(digits[:4]), int(digits[4:6]), int(digits[6:]), date_str)
+
+
+def split_date(date_str: str, separator: str = '/') -> list[str]:
+    """Split `date_str` into its three numeric fields, raising `ValueError` like `strptime` would."""
+    fields = date_str.split(separator)
+    if len(fields) != 3 or not all(field.isdigit() for field in fields):
+        raise ValueError(f"time data '{date_str}' does not match format")
+    return fields
+
+
+def validate_date(year: int, month: int, day: int, date_str: str) -> Date:
+    """Check that the fields form a real calendar date and get them as a tuple."""
+    if not 1 <= month <= 12 or not 1 <= day <= monthrange(year, month)[1] or year < 1:
+        raise ValueError(f"time data '{date_str}' is not a valid date")
+    return year, month, day
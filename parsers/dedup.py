@@ -0,0 +1,195 @@
+import hashlib
+import os
+import struct
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Tuple
+
+from parsers.pipeline import Stages, Transaction
+from storage.binary_format import BinaryReader, pack_count, pack_header, pack_string
+from storage.files import atomic_write
+
+MAGIC = b'FTDDUP'
+# bump when the fingerprint or the layout of the file changes
+DEDUP_INDEX_VERSION = 1
+FINGERPRINT_SIZE = 8
+
+"""
+Dedup Index File Structure, little endian
+    magic 'FTDDUP', version: u16
+    number of files: u32, then per file id: u16 length, utf-8 file path
+    number of deferrals: u32, then per deferral: file id: u32, owner file id: u32
+    fingerprints: 8 byte digest, owner file id: u32
+"""
+DEFERRAL = struct.Struct('<II')
+RECORD = struct.Struct(f'<{FINGERPRINT_SIZE}sI')
+
+
+def normalize_dedup_description(description: str) -> str:
+    """Get the form of `description` used in fingerprints, ignoring case and runs of whitespace."""
+    return ' '.join(description.lower().split())
+
+
+def get_fingerprint(transaction: Transaction, ordinal: int) -> bytes:
+    """
+    Get the fingerprint of the `ordinal`-th transaction of its file with the same date, value and description.
+    The directory of the file is included so only exports of the same kind of statement are compared.
+    """
+    year, month, day = transaction.date
+    key = (f'{os.path.dirname(transaction.file_path)}|{year}-{month}-{day}|{transaction.value}|'
+           f'{normalize_dedup_description(transaction.desc)}|{ordinal}')
+    return hashlib.blake2b(key.encode(), digest_size=FINGERPRINT_SIZE).digest()
+
+
+def iter_fingerprints(transactions: Iterable[Transaction]) -> Iterator[Tuple[bytes, Transaction]]:
+    """Yield the fingerprint of each transaction of a single file along with the transaction."""
+    occurrences = Counter()
+    for transaction in transactions:
+        key = (transaction.date, transaction.value, normalize_dedup_description(transaction.desc))
+        yield get_fingerprint(transaction, occurrences[key]), transaction
+        occurrences[key] += 1
+
+
+def collect_fingerprints(fingerprints: list[bytes], transactions: Iterable[Transaction]) -> Iterator[Transaction]:
+    """Stage that appends the fingerprint of each transaction to `fingerprints` and passes none of them on."""
+    for fingerprint, _ in iter_fingerprints(transactions):
+        fingerprints.append(fingerprint)
+    yield from ()
+
+
+def skip_positions(positions: frozenset[int], transactions: Iterable[Transaction]) -> Iterator[Transaction]:
+    """Stage that passes on the transactions of a single file, except those at `positions`."""
+    for position, transaction in enumerate(transactions):
+        if position not in positions:
+            yield transaction
+
+
+class DedupIndex:
+    """
+    Fingerprints of every ingested transaction mapped to the id of the statement file that first contained it.
+    Transactions whose fingerprint belongs to another file are skipped before classification, so statement
+    exports with overlapping date ranges are only counted once.
+    Files that skipped transactions of another file are its dependents, and have to be parsed again once it
+    changes or is removed.
+    `is_loaded` is false when `index_file` is missing, outdated, truncated or corrupt. The index then starts empty
+    and every file it would have covered has to be parsed again to rebuild it.
+    """
+
+    def __init__(self, index_file: str = None):
+        self.index_file = index_file
+        self.clear()
+        self.is_loaded = bool(index_file) and os.path.exists(index_file) and self.load()
+
+    def clear(self):
+        """Forget every file, fingerprint and deferral."""
+        self.file_paths: list[str] = []
+        self.file_ids: Dict[str, int] = {}
+        self.owners: Dict[bytes, int] = {}
+        self.owned: Dict[int, list[bytes]] = {}
+        # file id -> ids of the files it skipped transactions in favor of
+        self.deferrals: Dict[int, set[int]] = {}
+
+    def get_file_id(self, file_path: str) -> int:
+        """Get the id of `file_path`, assigning the next free one if it has none."""
+        file_id = self.file_ids.get(file_path)
+        if file_id is None:
+            file_id = self.file_ids[file_path] = len(self.file_paths)
+            self.file_paths.append(file_path)
+        return file_id
+
+    def add_stage(self, stages: Stages) -> Stages:
+        """Get `stages` with `skip_duplicates` run before any other stage ahead of classification."""
+        return stages._replace(before_classify=(self.skip_duplicates, *stages.before_classify))
+
+    def skip_duplicates(self, transactions: Iterable[Transaction]) -> Iterator[Transaction]:
+        """Pass on the transactions of a single file, except those whose fingerprint belongs to another file."""
+        for fingerprint, transaction in iter_fingerprints(transactions):
+            if self.claim(transaction.file_path, fingerprint):
+                yield transaction
+
+    def get_skipped_positions(self, file_path: str, fingerprints: Iterable[bytes]) -> frozenset[int]:
+        """
+        Claim the `fingerprints` of every transaction of `file_path`, in file order, as `skip_duplicates` would.
+        Get the positions of the transactions to skip, for `skip_positions`.
+        """
+        return frozenset(position for position, fingerprint in enumerate(fingerprints)
+                         if not self.claim(file_path, fingerprint))
+
+    def claim(self, file_path: str, fingerprint: bytes) -> bool:
+        """Make `file_path` the owner of `fingerprint` unless another file owns it. Check whether it owns it."""
+        file_id = self.get_file_id(file_path)
+        owner = self.owners.get(fingerprint)
+        if owner is None:
+            self.owners[fingerprint] = file_id
+            self.owned.setdefault(file_id, []).append(fingerprint)
+        elif owner != file_id:
+            self.deferrals.setdefault(file_id, set()).add(owner)
+            return False
+        return True
+
+    def release(self, file_path: str) -> list[str]:
+        """
+        Forget the fingerprints and deferrals of `file_path` before it is parsed again or after it was removed.
+        Returns the paths of its dependents.
+        """
+        file_id = self.file_ids.get(file_path)
+        if file_id is None:
+            return []
+        for fingerprint in self.owned.pop(file_id, []):
+            del self.owners[fingerprint]
+        self.deferrals.pop(file_id, None)
+        return [self.file_paths[dependent] for dependent, owners in self.deferrals.items() if file_id in owners]
+
+    def retain(self, file_paths: Iterable[str]):
+        """Release every file that is not in `file_paths`, e.g. because the manifest no longer records it."""
+        file_paths = set(file_paths)
+        for file_path in list(self.file_ids.keys()):
+            if file_path not in file_paths:
+                self.release(file_path)
+
+    def load(self) -> bool:
+        """Read `index_file`. Check whether it is a complete index of this version, otherwise start empty."""
+        with open(self.index_file, 'rb') as f:
+            buffer = f.read()
+        try:
+            self.read_index(buffer)
+            return True
+        except (struct.error, UnicodeDecodeError, ValueError):
+            self.clear()
+            return False
+
+    def read_index(self, buffer: bytes):
+        """Read the index written by `save` from `buffer`, raising `ValueError` if it is incomplete or outdated."""
+        reader = BinaryReader(buffer)
+        magic, version = reader.read_header()
+        if magic != MAGIC or version != DEDUP_INDEX_VERSION:
+            raise ValueError(f'{self.index_file} is not a version {DEDUP_INDEX_VERSION} dedup index')
+        for _ in range(reader.read_count()):
+            self.get_file_id(reader.read_string())
+        num_deferrals = reader.read_count()
+        offset = reader.offset
+        records_offset = offset + num_deferrals * DEFERRAL.size
+        if len(buffer) < records_offset or (len(buffer) - records_offset) % RECORD.size:
+            raise ValueError(f'{self.index_file} is truncated')
+        num_files = len(self.file_paths)
+        for file_id, owner in DEFERRAL.iter_unpack(buffer[offset:records_offset]):
+            if file_id >= num_files or owner >= num_files:
+                raise ValueError(f'{self.index_file} refers to unknown files')
+            self.deferrals.setdefault(file_id, set()).add(owner)
+        for fingerprint, file_id in RECORD.iter_unpack(buffer[records_offset:]):
+            if file_id >= num_files:
+                raise ValueError(f'{self.index_file} refers to unknown files')
+            self.owners[fingerprint] = file_id
+            self.owned.setdefault(file_id, []).append(fingerprint)
+
+    def save(self):
+        """Write the index to `index_file`, replacing it atomically."""
+        if not self.index_file:
+            return
+        deferrals = [(file_id, owner) for file_id, owners in self.deferrals.items() for owner in owners]
+        with atomic_write(self.index_file) as temp_file, open(temp_file, 'wb') as f:
+            f.write(pack_header(MAGIC, DEDUP_INDEX_VERSION))
+            f.write(pack_count(len(self.file_paths)))
+            f.writelines(pack_string(file_path) for file_path in self.file_paths)
+            f.write(pack_count(len(deferrals)))
+            f.writelines(DEFERRAL.pack(file_id, owner) for file_id, owner in deferrals)
+            f.writelines(RECORD.pack(fingerprint, file_id) for fingerprint, file_id in self.owners.items())
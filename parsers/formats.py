@@ -0,0 +1,115 @@
+import os
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+from finance_data import FinanceData
+from parsers.classifier import Classifier
+from parsers.json_parser import read_json_transactions
+from parsers.ofx_parser import read_ofx_transactions
+from parsers.pipeline import (NO_STAGES, Stages, Transaction, UnknownCategory, read_rows, run_rows_pipeline,
+                              run_transactions_pipeline)
+
+# normalized header names, used as the fingerprint of a file's format
+Header = Tuple[str, ...]
+
+
+class ColumnLayout(NamedTuple):
+    """Column indices of the fields of a statement file, resolved once from its header row."""
+    width: int
+    date: int
+    description: int
+    amount: int
+    transaction_type: int | None = None
+
+
+class StatementFormat(NamedTuple):
+    """
+    A kind of statement file.
+    `columns` maps each field of `ColumnLayout` to the header names it can appear under,
+    `default_layout` is used for files in this format's directory whose header is not recognized.
+    `normalize_imported` adapts transactions from the non csv importers of `IMPORTERS` to what `parse_row` produces.
+    """
+    name: str
+    columns: Dict[str, Tuple[str, ...]]
+    default_layout: ColumnLayout
+    parse_row: Callable[[ColumnLayout, str, int, List[str]], Transaction | None]
+    get_unknown_category: UnknownCategory
+    normalize_imported: Callable[[Transaction], Transaction | None]
+
+
+FORMATS: Dict[str, StatementFormat] = {}
+
+# streaming importers by lowercase file extension, every other file is read as csv
+IMPORTERS: Dict[str, Callable[[str], Iterator[Transaction]]] = {
+    '.ofx': read_ofx_transactions,
+    '.qfx': read_ofx_transactions,
+    '.json': read_json_transactions,
+    '.ndjson': read_json_transactions,
+    '.jsonl': read_json_transactions,
+}
+
+
+def register_format(statement_format: StatementFormat):
+    """Make `statement_format` available to `detect_format`."""
+    FORMATS[statement_format.name] = statement_format
+    detect_format.cache_clear()
+
+
+def normalize_header(row: List[str]) -> Header:
+    """Get the fingerprint of a header row, ignoring case and surrounding whitespace."""
+    return tuple(name.strip().lower() for name in row)
+
+
+def get_layout(statement_format: StatementFormat, header: Header) -> ColumnLayout | None:
+    """Get the layout of `header` in `statement_format`, or `None` if a required column is missing."""
+    indices = {}
+    for field, names in statement_format.columns.items():
+        index = next((index for index, name in enumerate(header) if name in names), None)
+        if index is None:
+            return None
+        indices[field] = index
+    return ColumnLayout(len(header), **indices)
+
+
+@lru_cache(maxsize=256)
+def detect_format(header: Header, default_format_name: str) -> Tuple[StatementFormat, ColumnLayout]:
+    """
+    Get the registered format that recognizes the most columns of `header`, along with its layout.
+    Falls back to the default layout of `default_format_name` if no format recognizes the header.
+    Results are cached per header fingerprint.
+    """
+    matches = []
+    for statement_format in FORMATS.values():
+        layout = get_layout(statement_format, header)
+        if layout is not None:
+            # the default format wins ties
+            matches.append((len(statement_format.columns), statement_format.name == default_format_name,
+                            statement_format.name, layout))
+    if not matches:
+        default_format = FORMATS[default_format_name]
+        return default_format, default_format.default_layout
+    *_, name, layout = max(matches)
+    return FORMATS[name], layout
+
+
+def run_statement_pipeline(finance_data: FinanceData,
+                           classifier: Classifier,
+                           file_path: str,
+                           default_format: StatementFormat,
+                           stages: Stages = NO_STAGES):
+    """
+    Stream `file_path` through the importer registered for its extension, or else detect its csv format from
+    its header row and stream the remaining rows through the pipeline.
+    """
+    importer = IMPORTERS.get(os.path.splitext(file_path)[1].lower())
+    if importer:
+        transactions = filter(None, map(default_format.normalize_imported, importer(file_path)))
+        run_transactions_pipeline(finance_data, classifier, transactions, default_format.get_unknown_category, stages)
+        return
+    rows = read_rows(file_path)
+    _, header = next(rows, (None, None))
+    if header is None:
+        return
+    statement_format, layout = detect_format(normalize_header(header), default_format.name)
+    run_rows_pipeline(finance_data, classifier, rows, file_path, partial(statement_format.parse_row, layout),
+                      statement_format.get_unknown_category, stages)
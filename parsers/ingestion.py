@@ -0,0 +1,201 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from functools import partial
+from typing import Callable, ContextManager, Iterator, Tuple
+
+from finance_data import FinanceData
+from parsers.classification_cache import ClassificationCache
+from parsers.classifier import Classifier
+from parsers.dedup import DedupIndex, collect_fingerprints, skip_positions
+from parsers.manifest import Manifest
+from parsers.pipeline import NO_STAGES, Stages
+
+ParseFile = Callable[[FinanceData, Classifier, str, Stages], None]
+
+# per-process state set by `init_worker`
+_worker_classifier: Classifier = None
+_worker_data_type: type[FinanceData] = FinanceData
+_worker_default_values: dict = None
+
+
+def list_files(directory: str) -> list[str]:
+    """Get the paths of all files in `directory`."""
+    return [f'{directory}/{file_name}' for file_name in os.listdir(directory)]
+
+
+def parse_files(finance_data: FinanceData,
+                classifier: Classifier,
+                file_paths: list[str],
+                parse_file: ParseFile,
+                workers: int = 1,
+                manifest: Manifest = None,
+                dedup_index: DedupIndex = None,
+                stages: Stages = NO_STAGES):
+    """
+    Parse each file in `file_paths` with `parse_file` and `stages` and add the results to `finance_data`.
+    With more than one worker, files are parsed into partial `FinanceData` objects in a process pool
+    and merged back in `file_paths` order.
+    With a `manifest`, only new or changed files are parsed and the old contribution of a changed file
+    is removed from `finance_data` before its new one is added.
+    With a `dedup_index`, the dependents of changed files are parsed again along with them.
+    """
+    if manifest:
+        changed_files = manifest.get_changed_files(file_paths)
+        if dedup_index:
+            changed_files = release_changed_files(dedup_index, manifest, changed_files, file_paths)
+        file_paths = changed_files
+        for file_path in file_paths:
+            old_contribution = manifest.pop_contribution(file_path)
+            if old_contribution:
+                manifest.load_years(finance_data, old_contribution.get_years())
+                finance_data.remove_file(file_path, old_contribution)
+    else:
+        if dedup_index:
+            for file_path in file_paths:
+                dedup_index.release(file_path)
+        if workers <= 1 or len(file_paths) <= 1:
+            stages = dedup_index.add_stage(stages) if dedup_index else stages
+            for file_path in file_paths:
+                parse_file(finance_data, classifier, file_path, stages)
+            return
+
+    file_stages = get_file_stages(finance_data, classifier, file_paths, parse_file, workers, dedup_index, stages)
+    for file_path, partial_data in zip(file_paths, parse_partials(finance_data, classifier, file_paths,
+                                                                  parse_file, file_stages, workers)):
+        if manifest:
+            manifest.load_years(finance_data, partial_data.get_years())
+        finance_data.merge(partial_data)
+        if manifest:
+            manifest.record(file_path, partial_data)
+
+
+def get_file_stages(finance_data: FinanceData,
+                    classifier: Classifier,
+                    file_paths: list[str],
+                    parse_file: ParseFile,
+                    workers: int,
+                    dedup_index: DedupIndex | None,
+                    stages: Stages) -> list[Stages]:
+    """
+    Get the stages to parse each file in `file_paths` with, skipping duplicates if there is a `dedup_index`.
+    Files parsed in this process share the index as they are parsed in order. For a process pool, the fingerprints
+    of every file are collected in the pool first, then claimed here in `file_paths` order, so each file skips the
+    same transactions as it would when parsed in order.
+    """
+    if not dedup_index:
+        return [stages] * len(file_paths)
+    if workers <= 1 or len(file_paths) <= 1:
+        return [dedup_index.add_stage(stages)] * len(file_paths)
+    file_stages = []
+    fingerprints_of_files = collect_fingerprints_of_files(finance_data, classifier, file_paths, parse_file, workers)
+    for file_path, fingerprints in zip(file_paths, fingerprints_of_files):
+        skipped = dedup_index.get_skipped_positions(file_path, fingerprints)
+        file_stages.append(stages._replace(before_classify=(partial(skip_positions, skipped),
+                                                            *stages.before_classify)))
+    return file_stages
+
+
+def release_changed_files(dedup_index: DedupIndex,
+                          manifest: Manifest,
+                          changed_files: list[str],
+                          file_paths: list[str]) -> list[str]:
+    """
+    Release the fingerprints of each changed file and mark its dependents in `file_paths` as changed too.
+    Returns every file to parse, in `file_paths` order.
+    """
+    changed_files = list(changed_files)
+    for file_path in changed_files:
+        for dependent in dedup_index.release(file_path):
+            if dependent in file_paths and dependent not in changed_files:
+                manifest.invalidate(dependent)
+                changed_files += manifest.get_changed_files([dependent])
+    changed_files = set(changed_files)
+    return [file_path for file_path in file_paths if file_path in changed_files]
+
+
+def parse_partials(finance_data: FinanceData,
+                   classifier: Classifier,
+                   file_paths: list[str],
+                   parse_file: ParseFile,
+                   file_stages: list[Stages],
+                   workers: int) -> Iterator[FinanceData]:
+    """
+    Parse each file in `file_paths` with its `file_stages` into its own `FinanceData`,
+    in a process pool if `workers` is above 1.
+    """
+    if workers <= 1 or len(file_paths) <= 1:
+        for file_path, stages in zip(file_paths, file_stages):
+            partial_data = type(finance_data)(finance_data.default_values)
+            parse_file(partial_data, classifier, file_path, stages)
+            yield partial_data
+        return
+
+    with create_pool(finance_data, classifier, workers, len(file_paths)) as executor:
+        for partial_data, new_entries in executor.map(partial(parse_partial, parse_file), file_paths, file_stages):
+            if new_entries:
+                classifier.merge(new_entries)
+            yield partial_data
+
+
+def collect_fingerprints_of_files(finance_data: FinanceData,
+                                  classifier: Classifier,
+                                  file_paths: list[str],
+                                  parse_file: ParseFile,
+                                  workers: int) -> Iterator[list[bytes]]:
+    """Get the fingerprints of the transactions of each file in `file_paths`, in a process pool."""
+    with create_pool(finance_data, classifier, workers, len(file_paths)) as executor:
+        yield from executor.map(partial(collect_file_fingerprints, parse_file), file_paths)
+
+
+@contextmanager
+def create_pool(finance_data: FinanceData,
+                classifier: Classifier,
+                workers: int,
+                num_files: int) -> Iterator[ProcessPoolExecutor]:
+    """
+    Create a process pool whose workers parse with `classifier` into the `FinanceData` type of `finance_data`.
+    A `ClassificationCache` is shared with the workers as a read-only copy.
+    """
+    with share_classifier(classifier) as worker_classifier:
+        initargs = (worker_classifier, type(finance_data), finance_data.default_values)
+        with ProcessPoolExecutor(max_workers=min(workers, num_files), initializer=init_worker,
+                                 initargs=initargs) as executor:
+            yield executor
+
+
+def share_classifier(classifier: Classifier) -> ContextManager[Classifier]:
+    """Get the classifier to hand to worker processes for the duration of a pool."""
+    if isinstance(classifier, ClassificationCache):
+        return classifier.share_with_workers()
+    return nullcontext(classifier)
+
+
+def init_worker(classifier: Classifier, data_type: type[FinanceData], default_values: dict):
+    """Store the classifier, `FinanceData` type and default values once per worker process."""
+    global _worker_classifier, _worker_data_type, _worker_default_values
+    _worker_classifier = classifier
+    _worker_data_type = data_type
+    _worker_default_values = default_values
+
+
+def parse_partial(parse_file: ParseFile, file_path: str, stages: Stages) -> Tuple[FinanceData, dict]:
+    """
+    Parse `file_path` into a new `FinanceData` inside a worker process.
+    Also get the classification cache entries added meanwhile, if the worker has a cache.
+    """
+    partial_data = _worker_data_type(_worker_default_values)
+    parse_file(partial_data, _worker_classifier, file_path, stages)
+    if isinstance(_worker_classifier, ClassificationCache):
+        return partial_data, _worker_classifier.pop_new_entries()
+    return partial_data, {}
+
+
+def collect_file_fingerprints(parse_file: ParseFile, file_path: str) -> list[bytes]:
+    """Get the fingerprints of the transactions of `file_path` inside a worker process, without classifying them."""
+    fingerprints = []
+    # the warnings about invalid rows are printed once the file is parsed
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        parse_file(_worker_data_type(_worker_default_values), _worker_classifier, file_path,
+                   Stages(before_classify=(partial(collect_fingerprints, fingerprints),)))
+    return fingerprints
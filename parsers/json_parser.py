@@ -0,0 +1,165 @@
+import json
+from decimal import Decimal
+from typing import Any, Dict, Generator, Iterator, TextIO, Tuple
+
+from parsers.amounts import parse_cents
+from parsers.dates import parse_iso_date
+from parsers.pipeline import Transaction
+
+CHUNK_SIZE = 1 << 16
+
+# characters allowed between the records of a top level array or of newline delimited json
+SEPARATORS = ' \t\r\n,[]'
+WHITESPACE = ' \t\r\n'
+
+# keys a top level object can hold its array of records under, like `{"transactions": [...]}`
+RECORDS_KEYS: Tuple[str, ...] = ('transactions', 'records', 'data')
+
+# keys each field can appear under in a record, in order of preference
+FIELD_NAMES: Dict[str, Tuple[str, ...]] = {
+    'date': ('date', 'posted', 'transaction_date'),
+    'description': ('description', 'desc', 'name', 'memo'),
+    'amount': ('amount', 'value'),
+    'transaction_type': ('type', 'transaction_type'),
+    'category': ('category',),
+}
+
+
+class JsonReader:
+    """Decode json values from a text file one at a time, keeping only the unread rest of the current chunk."""
+
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        # keep decimals exact so amounts are converted to cents without going through `float`
+        self.decoder = json.JSONDecoder(parse_float=Decimal)
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def read_chunk(self) -> bool:
+        """Append the next chunk to the unread rest of the buffer. Check whether there was one."""
+        chunk = '' if self.eof else self.f.read(self.chunk_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return not self.eof
+
+    def peek(self, separators: str = WHITESPACE) -> str:
+        """Skip any `separators` and get the next character without reading it, `''` at the end of the file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in separators:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_chunk():
+                return ''
+
+    def expect(self, char: str):
+        """Read `char` after any whitespace, raise `json.JSONDecodeError` if something else comes first."""
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self.buffer, self.position)
+        self.position += 1
+
+    def read_value(self) -> Any:
+        """Decode the value after any whitespace, reading chunks until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if self.eof or self.is_complete(value, end):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                # the value continues in the next chunk, unless there is none
+                if self.eof:
+                    raise
+            self.read_chunk()
+
+    def is_complete(self, value: Any, end: int) -> bool:
+        """Check whether `value` decoded up to `end` cannot continue in the next chunk."""
+        # a number may be cut off before its fraction or exponent, like `12.` or `12e`
+        if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+            return end < len(self.buffer) and self.buffer[end] in WHITESPACE + ',]}'
+        return True
+
+
+def iter_json_records(f: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yield each value of a top level json array, of newline delimited json, or of the array under one of
+    `RECORDS_KEYS` in a top level object, reading the document in chunks.
+    Only the value being decoded and the rest of the current chunk are kept in memory.
+    """
+    reader = JsonReader(f, chunk_size)
+    if reader.peek() == '{' and (yield from iter_wrapped_records(reader)):
+        return
+    while reader.peek(SEPARATORS):
+        yield reader.read_value()
+
+
+def iter_wrapped_records(reader: JsonReader) -> Generator[Any, None, bool]:
+    """
+    Read the object at the start of the document, yielding the records of its array under one of `RECORDS_KEYS`.
+    Returns whether it had one, an object without one is yielded as the first record of newline delimited json.
+    """
+    reader.expect('{')
+    members = {}
+    has_records = False
+    while reader.peek() != '}':
+        if members or has_records:
+            reader.expect(',')
+        key = reader.read_value()
+        reader.expect(':')
+        if key in RECORDS_KEYS and reader.peek() == '[':
+            reader.expect('[')
+            while reader.peek(WHITESPACE + ',') != ']':
+                yield reader.read_value()
+            reader.expect(']')
+            has_records = True
+        else:
+            members[key] = reader.read_value()
+    reader.expect('}')
+    if has_records:
+        return True
+    # an object holding its records under another key would otherwise be reported as a single invalid record
+    if get_field(members, 'date') is None:
+        for key, value in members.items():
+            if isinstance(value, list):
+                raise ValueError(f'{reader.f.name}: records under "{key}" are not read, add the key to `RECORDS_KEYS`')
+    yield members
+    return False
+
+
+def read_json_transactions(file_path: str) -> Iterator[Transaction]:
+    """
+    Stream the records of a json or ndjson export as transactions.
+    Values are positive cents, the direction comes from the record's type or else from the sign of its amount.
+    """
+    with open(file_path, 'r') as f:
+        for index, record in enumerate(iter_json_records(f)):
+            transaction = create_transaction(record, file_path, index)
+            if transaction:
+                yield transaction
+
+
+def get_field(record: Dict[str, Any], field: str) -> Any:
+    """Get the value of `field` from `record` under the first of its `FIELD_NAMES` that is present."""
+    return next((record[name] for name in FIELD_NAMES[field] if record.get(name) is not None), None)
+
+
+def create_transaction(record: Any, file_path: str, index: int) -> Transaction | None:
+    """Create a `Transaction` from a single json record."""
+    if not isinstance(record, dict):
+        print(f'{file_path}: transaction {index + 1} invalid')
+        return None
+    date_str = get_field(record, 'date')
+    desc = get_field(record, 'description')
+    amount = get_field(record, 'amount')
+    if date_str is None or desc is None or amount is None:
+        print(f'{file_path}: transaction {index + 1} invalid')
+        return None
+    date = parse_iso_date(str(date_str))
+    value = parse_cents(str(amount))
+    transaction_type = get_field(record, 'transaction_type')
+    transaction_type = str(transaction_type).upper() if transaction_type else 'CREDIT' if value > 0 else 'DEBIT'
+    return Transaction(date, str(desc), abs(value), transaction_type, get_field(record, 'category'), file_path, index)
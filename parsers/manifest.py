@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Set
+
+from finance_data import FinanceData
+from storage.files import atomic_write, get_file_fingerprint
+from storage.snapshot import Snapshot, write_snapshot
+
+# bump when the layout or units of the stored entries change
+MANIFEST_VERSION = 4
+CONTRIBUTION_SUFFIX = '.snapshot'
+
+"""
+Manifest File Structure, the contribution of each file and the total of all contributions are kept in snapshot files
+{
+    fingerprint: 'manifest version:config fingerprint',
+    files: {
+        file_path: {
+            size: bytes,
+            mtime: nanoseconds,
+            sha256: 'content hash'
+        }
+    }
+}
+"""
+
+
+class Manifest:
+    """
+    Records the size, mtime and content hash of every parsed statement file.
+    The aggregated contribution of each file is written to its own snapshot in `contributions_dir`, which is only
+    read once that file changes or is removed. The total of all contributions is written to a memory mapped
+    `snapshot_file`.
+    Everything is discarded when `fingerprint` differs from the one the manifest and snapshot were written with.
+    """
+
+    def __init__(self,
+                 manifest_file: str,
+                 fingerprint: str,
+                 default_values: Dict[str, Dict[str, float]],
+                 snapshot_file: str,
+                 contributions_dir: str):
+        self.manifest_file = manifest_file
+        self.snapshot_file = snapshot_file
+        self.contributions_dir = contributions_dir
+        self.fingerprint = f'{MANIFEST_VERSION}:{fingerprint}'
+        self.default_values = default_values
+        self.files: Dict[str, dict] = {}
+        self.pending_stats: Dict[str, dict] = {}
+        # contributions parsed in this run, written by `save`
+        self.pending_contributions: Dict[str, FinanceData] = {}
+        # years of the snapshot that were not loaded yet
+        self.unloaded_years: Set[int] = set()
+
+        if os.path.exists(manifest_file) and self.has_valid_snapshot():
+            with open(manifest_file) as manifest_json:
+                manifest = json.load(manifest_json)
+            if manifest.get('fingerprint') == self.fingerprint and all(
+                    os.path.exists(self.get_contribution_file(file_path)) for file_path in manifest['files']):
+                self.files = manifest['files']
+
+    def has_valid_snapshot(self) -> bool:
+        """Check whether `snapshot_file` exists and was written with the current fingerprint."""
+        if not os.path.exists(self.snapshot_file):
+            return False
+        try:
+            with Snapshot(self.snapshot_file) as snapshot:
+                return snapshot.fingerprint == self.fingerprint
+        except ValueError:
+            return False
+
+    def load_finance_data(self, finance_data: FinanceData, years: list[int] = None) -> FinanceData:
+        """
+        Load the aggregated data of `years`, or of every year, recorded by the previous run into `finance_data`,
+        unless it already holds it, like a stored ledger that was saved along with the snapshot.
+        Other years are only read by `load_years`, once a contribution to them changes or `save` needs them.
+        Data that keeps its transactions cannot be restored from the totals, every file is parsed again for it.
+        """
+        if self.files and finance_data.has_snapshot(self.get_snapshot_id()):
+            return finance_data
+        if finance_data.keeps_transactions:
+            self.files = {}
+            finance_data.clear()
+            return finance_data
+        if self.files:
+            with Snapshot(self.snapshot_file) as snapshot:
+                self.unloaded_years = set(snapshot.get_years())
+        return self.load_years(finance_data, self.unloaded_years if years is None else years)
+
+    def load_years(self, finance_data: FinanceData, years: Iterable[int]) -> FinanceData:
+        """Load the years in `years` that `load_finance_data` left out into `finance_data`. Returns `finance_data`."""
+        years = self.unloaded_years.intersection(years)
+        if years:
+            with Snapshot(self.snapshot_file) as snapshot:
+                snapshot.load_into(finance_data, [year for year in snapshot.get_years() if year in years])
+            self.unloaded_years -= years
+        return finance_data
+
+    def get_snapshot_id(self) -> str:
+        """Get an id of the current `snapshot_file` that changes whenever it is written."""
+        stat = os.stat(self.snapshot_file)
+        return f'{self.fingerprint}:{stat.st_size}:{stat.st_mtime_ns}'
+
+    def get_changed_files(self, file_paths: list[str]) -> list[str]:
+        """Get the paths in `file_paths` that are new or whose contents changed since they were recorded."""
+        changed_files = []
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            record = self.files.get(file_path)
+            if record and record['size'] == stat.st_size and record['mtime'] == stat.st_mtime_ns:
+                continue
+            content_hash = get_file_fingerprint(file_path)
+            if record and record['sha256'] == content_hash:
+                # touched but not modified
+                record['mtime'] = stat.st_mtime_ns
+                continue
+            self.pending_stats[file_path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': content_hash}
+            changed_files.append(file_path)
+        return changed_files
+
+    def get_contribution_file(self, file_path: str) -> str:
+        """Get the path of the snapshot that holds the contribution of `file_path`, named by a hash of the path."""
+        return f'{self.contributions_dir}/{hashlib.sha256(file_path.encode()).hexdigest()[:32]}{CONTRIBUTION_SUFFIX}'
+
+    def pop_contribution(self, file_path: str) -> FinanceData | None:
+        """Remove and get the recorded contribution of `file_path`, if it was recorded."""
+        record = self.files.pop(file_path, None)
+        if record is None:
+            return None
+        contribution = self.pending_contributions.pop(file_path, None)
+        if contribution is not None:
+            return contribution
+        with Snapshot(self.get_contribution_file(file_path)) as snapshot:
+            if snapshot.fingerprint != self.fingerprint:
+                raise ValueError(f'contribution of {file_path} was written with another fingerprint')
+            return snapshot.load_into(FinanceData(self.default_values))
+
+    def invalidate(self, file_path: str):
+        """Make `get_changed_files` treat `file_path` as changed even if its contents are the same."""
+        record = self.files.get(file_path)
+        if record:
+            record['size'] = record['mtime'] = -1
+            record['sha256'] = ''
+
+    def pop_missing_contributions(self, file_paths: list[str]) -> Dict[str, FinanceData]:
+        """Remove and get the contributions of recorded files that are not in `file_paths`, by file path."""
+        file_paths = set(file_paths)
+        missing_files = [file_path for file_path in self.files.keys() if file_path not in file_paths]
+        return {file_path: self.pop_contribution(file_path) for file_path in missing_files}
+
+    def record(self, file_path: str, contribution: FinanceData):
+        """Record the stats found by `get_changed_files` and the parsed `contribution` of `file_path`."""
+        self.files[file_path] = self.pending_stats.pop(file_path)
+        self.pending_contributions[file_path] = contribution
+
+    def save(self, finance_data: FinanceData):
+        """
+        Write the manifest and the contributions parsed in this run, with `finance_data` as the new total in
+        the snapshot. Contributions of files that are no longer recorded are removed.
+        Years that were not loaded yet are loaded into `finance_data` first, so the snapshot keeps every year.
+        """
+        self.load_years(finance_data, self.unloaded_years)
+        for file_path, contribution in self.pending_contributions.items():
+            write_snapshot(contribution, self.get_contribution_file(file_path), self.fingerprint)
+        self.pending_contributions = {}
+        if os.path.exists(self.contributions_dir):
+            recorded = {os.path.basename(self.get_contribution_file(file_path)) for file_path in self.files}
+            for file_name in os.listdir(self.contributions_dir):
+                if file_name.endswith(CONTRIBUTION_SUFFIX) and file_name not in recorded:
+                    os.remove(os.path.join(self.contributions_dir, file_name))
+        write_snapshot(finance_data, self.snapshot_file, self.fingerprint)
+        finance_data.set_snapshot(self.get_snapshot_id())
+        manifest = {'fingerprint': self.fingerprint, 'files': self.files}
+        with atomic_write(self.manifest_file) as temp_file, open(temp_file, 'w') as manifest_json:
+            json.dump(manifest, manifest_json)
@@ -0,0 +1,67 @@
+import html
+import re
+from typing import Dict, Iterator, TextIO, Tuple
+
+from parsers.amounts import parse_cents
+from parsers.dates import parse_ofx_date
+from parsers.pipeline import Transaction
+
+CHUNK_SIZE = 1 << 16
+
+# a tag and the text up to the next tag, OFX 1.x (SGML) leaves the closing tags of leaf elements out
+tag_pattern = re.compile(r'<([^<>]*)>([^<]*)')
+
+
+def iter_ofx_events(f: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, str]]:
+    """
+    Yield a `(tag, text)` event for every tag in an OFX 1.x (SGML) or 2.x (XML) document, reading it in chunks.
+    Closing tags start with `/`, the text of a tag is everything up to the next tag.
+    """
+    buffer = ''
+    for chunk in iter(lambda: f.read(chunk_size), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            match = tag_pattern.search(buffer, position)
+            # the text of the last tag in the buffer may continue in the next chunk
+            if not match or match.end() == len(buffer):
+                break
+            yield match.group(1), match.group(2)
+            position = match.end()
+        buffer = buffer[position:]
+    for match in tag_pattern.finditer(buffer):
+        yield match.group(1), match.group(2)
+
+
+def read_ofx_transactions(file_path: str) -> Iterator[Transaction]:
+    """
+    Stream the `STMTTRN` records of an OFX or QFX file as transactions, one record in memory at a time.
+    Values are positive cents, the direction is kept as a `CREDIT` or `DEBIT` transaction type like bank csv files.
+    """
+    fields: Dict[str, str] | None = None
+    index = 0
+    with open(file_path, 'r', errors='replace') as f:
+        for tag, text in iter_ofx_events(f):
+            tag = tag.strip().upper()
+            if tag == 'STMTTRN':
+                fields = {}
+            elif tag == '/STMTTRN' and fields is not None:
+                transaction = create_transaction(fields, file_path, index)
+                if transaction:
+                    yield transaction
+                fields = None
+                index += 1
+            elif fields is not None and not tag.startswith('/'):
+                fields[tag] = html.unescape(text.strip())
+
+
+def create_transaction(fields: Dict[str, str], file_path: str, index: int) -> Transaction | None:
+    """Create a `Transaction` from the leaf elements of a `STMTTRN` record."""
+    desc = ' '.join(fields[tag] for tag in ('NAME', 'MEMO') if fields.get(tag))
+    if 'DTPOSTED' not in fields or 'TRNAMT' not in fields or not desc:
+        print(f'{file_path}: transaction {index + 1} invalid')
+        return None
+    date = parse_ofx_date(fields['DTPOSTED'])
+    value = parse_cents(fields['TRNAMT'])
+    transaction_type = 'CREDIT' if value > 0 else 'DEBIT'
+    return Transaction(date, desc, abs(value), transaction_type, None, file_path, index)
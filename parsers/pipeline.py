@@ -0,0 +1,143 @@
+import csv
+from functools import partial
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Tuple
+
+from finance_data import Date, FinanceData
+from parsers.classifier import Classifier
+
+
+class Transaction(NamedTuple):
+    """A single normalized statement row. The category id is filled in by the classify stage."""
+    date: Date
+    desc: str
+    # integer cents
+    value: int
+    transaction_type: str | None
+    category_overwrite: str | None
+    file_path: str
+    index: int
+    category_id: int | None = None
+
+
+Stage = Callable[[Iterator[Transaction]], Iterator[Transaction]]
+ParseRow = Callable[[str, int, List[str]], Transaction | None]
+UnknownCategory = Callable[[Transaction], Tuple[str, str]]
+
+
+class Stages(NamedTuple):
+    """Extra stages plugged into a parser's pipeline before and after classification."""
+    before_classify: Tuple[Stage, ...] = ()
+    after_classify: Tuple[Stage, ...] = ()
+
+
+NO_STAGES = Stages()
+
+
+def run_file_pipeline(finance_data: FinanceData,
+                      classifier: Classifier,
+                      file_path: str,
+                      parse_row: ParseRow,
+                      get_unknown_category: UnknownCategory,
+                      stages: Stages = NO_STAGES):
+    """Stream `file_path` through read -> normalize -> classify -> aggregate, including any extra `stages`."""
+    run_rows_pipeline(finance_data, classifier, read_rows(file_path), file_path, parse_row, get_unknown_category,
+                      stages)
+
+
+def run_rows_pipeline(finance_data: FinanceData,
+                      classifier: Classifier,
+                      rows: Iterable[Tuple[int, List[str]]],
+                      file_path: str,
+                      parse_row: ParseRow,
+                      get_unknown_category: UnknownCategory,
+                      stages: Stages = NO_STAGES):
+    """Stream already read `rows` of `file_path` through normalize -> classify -> aggregate."""
+    run_transactions_pipeline(finance_data, classifier, normalize(rows, file_path, parse_row), get_unknown_category,
+                              stages)
+
+
+def run_transactions_pipeline(finance_data: FinanceData,
+                              classifier: Classifier,
+                              transactions: Iterator[Transaction],
+                              get_unknown_category: UnknownCategory,
+                              stages: Stages = NO_STAGES):
+    """Stream already normalized `transactions`, e.g. from a non csv importer, through classify -> aggregate."""
+    transactions = apply_stages(transactions, stages.before_classify)
+    transactions = classify(transactions, finance_data, classifier, get_unknown_category)
+    transactions = apply_stages(transactions, stages.after_classify)
+    aggregate(transactions, finance_data)
+
+
+def read_rows(file_path: str) -> Iterator[Tuple[int, List[str]]]:
+    """Yield each row of the csv file at `file_path` with its index."""
+    with open(file_path, 'r') as f:
+        yield from enumerate(csv.reader(f))
+
+
+def normalize(rows: Iterable[Tuple[int, List[str]]], file_path: str, parse_row: ParseRow) -> Iterator[Transaction]:
+    """Convert rows to transactions with `parse_row`, dropping rows it rejects."""
+    for index, row in rows:
+        transaction = parse_row(file_path, index, row)
+        if transaction:
+            yield transaction
+
+
+def apply_stages(transactions: Iterator[Transaction], stages: Iterable[Stage]) -> Iterator[Transaction]:
+    """Chain each stage in `stages` onto `transactions`."""
+    for stage in stages:
+        transactions = stage(transactions)
+    return transactions
+
+
+def classify(transactions: Iterable[Transaction],
+             finance_data: FinanceData,
+             classifier: Classifier,
+             get_unknown_category: UnknownCategory) -> Iterator[Transaction]:
+    """
+    Fill in the category id of each transaction.
+    Use `category_overwrite`, then `classifier`, then `get_unknown_category` if neither applies.
+    """
+    registry = finance_data.registry
+    for transaction in transactions:
+        # put value into it's category
+        if transaction.category_overwrite:
+            category_id = registry.get_id_for_minor(transaction.category_overwrite)
+            if category_id is not None:
+                yield transaction._replace(category_id=category_id)
+                continue
+            else:
+                print(f'{transaction.file_path}: line {transaction.index + 1} has an invalid category overwrite value')
+        # check if any rule matches the description, amount and type
+        category_id = classifier.classify(transaction.desc, transaction.value, transaction.transaction_type)
+        if category_id is None:
+            category_id = registry.get_id(*get_unknown_category(transaction))
+        yield transaction._replace(category_id=category_id)
+
+
+def aggregate(transactions: Iterable[Transaction], finance_data: FinanceData):
+    """Add the value of each classified transaction to `finance_data`."""
+    finance_data.add_transactions(transactions)
+
+
+def filter_stage(predicate: Callable[[Transaction], bool]) -> Stage:
+    """Create a stage that only passes on transactions for which `predicate` is true."""
+    return partial(_filter_transactions, predicate)
+
+
+def tap_stage(callback: Callable[[Transaction], None]) -> Stage:
+    """Create a stage that calls `callback` on every transaction and passes it on unchanged."""
+    return partial(_tap_transactions, callback)
+
+
+def _filter_transactions(predicate: Callable[[Transaction], bool],
+                         transactions: Iterable[Transaction]) -> Iterator[Transaction]:
+    for transaction in transactions:
+        if predicate(transaction):
+            yield transaction
+
+
+def _tap_transactions(callback: Callable[[Transaction], None],
+                      transactions: Iterable[Transaction]) -> Iterator[Transaction]:
+    for transaction in transactions:
+        callback(transaction)
+        yield transaction
@@ -0,0 +1,230 @@
+import re
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from categories import CategoryRegistry
+from parsers.amounts import parse_cents
+
+# kinds of literal rules, matched with the Aho-Corasick automaton
+SUBSTRING = 'substring'
+WORD = 'word'
+PREFIX = 'prefix'
+# matched with the combined regex
+REGEX = 'regex'
+REGEX_FLAGS = re.IGNORECASE | re.DOTALL
+RULE_KINDS = (SUBSTRING, WORD, PREFIX, REGEX)
+
+"""
+Rule Config Structure, exactly one of substring, word, prefix or regex and any of the predicates
+{
+    substring: 'contained anywhere in the description',
+    word: 'contained with word boundaries on both sides',
+    prefix: 'at the start of the description',
+    regex: 'python regular expression, searched anywhere in the description',
+    min_amount: 10.00,
+    max_amount: 99.99,
+    transaction_type: 'DEBIT'
+}
+"""
+RuleConfig = Dict[str, str | float]
+
+
+class Rule(NamedTuple):
+    """A single compiled category rule. Amounts are inclusive bounds in integer cents."""
+    major_category: str
+    minor_category: str
+    kind: str
+    pattern: str
+    min_amount: int | None = None
+    max_amount: int | None = None
+    transaction_type: str | None = None
+
+    def has_predicates(self) -> bool:
+        """Check whether the rule depends on more than the description."""
+        return self.min_amount is not None or self.max_amount is not None or self.transaction_type is not None
+
+    def accepts(self, value: int | None, transaction_type: str | None) -> bool:
+        """Check the amount and transaction type predicates of the rule."""
+        if self.transaction_type is not None and transaction_type != self.transaction_type:
+            return False
+        if self.min_amount is not None and (value is None or value < self.min_amount):
+            return False
+        if self.max_amount is not None and (value is None or value > self.max_amount):
+            return False
+        return True
+
+
+def create_rule(major_category: str, minor_category: str, rule_config: RuleConfig) -> Rule:
+    """Create a `Rule` from one entry of a category's `rules` list in the config."""
+    kinds = [kind for kind in RULE_KINDS if kind in rule_config]
+    if len(kinds) != 1:
+        raise ValueError(f'rule {rule_config} of {minor_category} needs exactly one of {", ".join(RULE_KINDS)}')
+    kind = kinds[0]
+    pattern = rule_config[kind] if kind == REGEX else rule_config[kind].lower()
+    if kind == REGEX:
+        try:
+            re.compile(pattern)
+        except re.error as error:
+            raise ValueError(f'rule {rule_config} of {minor_category} has an invalid regex: {error}') from error
+    return Rule(major_category, minor_category, kind, pattern,
+                get_amount(rule_config, 'min_amount'),
+                get_amount(rule_config, 'max_amount'),
+                rule_config.get('transaction_type'))
+
+
+def get_amount(rule_config: RuleConfig, key: str) -> int | None:
+    """Get the amount in cents stored under `key` in `rule_config`, if there is one."""
+    if key not in rule_config:
+        return None
+    return parse_cents(str(rule_config[key]))
+
+
+def get_regex_group(pattern: str, rule_index: int) -> str | None:
+    """
+    Get the optional lookahead that embeds `pattern` in the combined regex under a group named after `rule_index`,
+    or `None` if it cannot be embedded. Group numbers, backreferences and inline global flags of a pattern would
+    change meaning or fail to compile once it is part of the combined regex.
+    """
+    regex_group = f'(?=(?:.*?(?P<r{rule_index}>{pattern}))?)'
+    try:
+        if re.compile(pattern).groups or re.compile(regex_group).groups != 1:
+            return None
+    except re.error:
+        return None
+    return regex_group
+
+
+def is_word_char(char: str) -> bool:
+    """Check whether `char` is part of a word, the same way `\\w` does."""
+    return char.isalnum() or char == '_'
+
+
+class RuleClassifier:
+    """
+    Finds the first rule (in config order) that matches a transaction.
+    Literal rules share one Aho-Corasick automaton, so their cost does not grow with the number of rules.
+    Regex rules are combined into a single pattern of optional lookaheads with a named group per rule,
+    so every regex is evaluated by one search. Regexes that cannot be embedded in it, because they have groups of
+    their own or inline global flags, are searched one by one instead. Candidates from all of them are checked in
+    rule order against their anchors and predicates.
+    """
+
+    def __init__(self, rules: List[Rule], registry: CategoryRegistry):
+        self.rules = rules
+        self.category_ids: List[int] = [registry.get_id(rule.major_category, rule.minor_category) for rule in rules]
+        # rules that match as soon as their literal is found, without anchors or predicates
+        self.unconditional = [rule.kind == SUBSTRING and not rule.has_predicates() for rule in rules]
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # rule indices that end at each state, including rules reachable through fail links
+        self.outputs: List[Tuple[int, ...]] = [()]
+
+        regex_groups = []
+        # regexes searched on their own, by rule index
+        self.separate_regexes: List[Tuple[int, re.Pattern]] = []
+        for rule_index, rule in enumerate(rules):
+            if rule.kind == REGEX:
+                regex_group = get_regex_group(rule.pattern, rule_index)
+                if regex_group is None:
+                    self.separate_regexes.append((rule_index, re.compile(rule.pattern, REGEX_FLAGS)))
+                else:
+                    regex_groups.append(regex_group)
+            else:
+                self.add_pattern(rule.pattern, rule_index)
+        self.build_fail_links()
+        self.regex = re.compile(''.join(regex_groups), REGEX_FLAGS) if regex_groups else None
+
+    def add_pattern(self, pattern: str, rule_index: int):
+        """Add `pattern` to the trie as an output of `rule_index`."""
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append(())
+            state = next_state
+        self.outputs[state] += (rule_index,)
+
+    def build_fail_links(self):
+        """Compute fail links breadth first and fold each state's fail chain into `outputs`."""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            self.outputs[state] = tuple(sorted(self.outputs[state] + self.outputs[0]))
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                fail_outputs = self.outputs[self.fail[next_state]]
+                self.outputs[next_state] = tuple(sorted(self.outputs[next_state] + fail_outputs))
+                queue.append(next_state)
+
+    def classify(self, description: str, value: int = None, transaction_type: str = None) -> int | None:
+        """Get the category id of the first rule matching the transaction, or `None`."""
+        return self.choose(self.get_candidates(description), value, transaction_type)
+
+    def get_candidates(self, description: str) -> Tuple[int, ...]:
+        """
+        Get the indices of the rules whose pattern and anchors match `description`, in rule order and up to the first
+        one without predicates. Only these rules can match a transaction with this description.
+        """
+        description = description.lower()
+        rules = self.rules
+        best = len(rules)
+        candidates = []
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        state = 0
+        for position, char in enumerate(description):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for rule_index in outputs[state]:
+                if rule_index >= best:
+                    break
+                if self.unconditional[rule_index]:
+                    best = rule_index
+                    break
+                candidates.append((rule_index, position))
+
+        if self.regex:
+            match = self.regex.match(description)
+            candidates += [(int(name[1:]), None) for name, group in match.groupdict().items() if group is not None]
+        candidates += [(rule_index, None) for rule_index, regex in self.separate_regexes if regex.search(description)]
+
+        matches = []
+        for rule_index, end in sorted(candidates):
+            if rule_index >= best:
+                break
+            if matches and matches[-1] == rule_index:
+                # already matched at an earlier position
+                continue
+            if self.matches_anchor(rule_index, description, end):
+                matches.append(rule_index)
+                if not rules[rule_index].has_predicates():
+                    return tuple(matches)
+        if best < len(rules):
+            matches.append(best)
+        return tuple(matches)
+
+    def choose(self, candidates: Sequence[int], value: int = None, transaction_type: str = None) -> int | None:
+        """Get the category id of the first rule in `candidates` whose predicates accept the transaction, or `None`."""
+        for rule_index in candidates:
+            if self.rules[rule_index].accepts(value, transaction_type):
+                return self.category_ids[rule_index]
+        return None
+
+    def matches_anchor(self, rule_index: int, description: str, end: int | None) -> bool:
+        """Check the anchors of a literal rule that ends at index `end` of `description`."""
+        rule = self.rules[rule_index]
+        start = None if end is None else end - len(rule.pattern) + 1
+        if rule.kind == PREFIX:
+            return start == 0
+        if rule.kind == WORD:
+            return ((start == 0 or not is_word_char(description[start - 1])) and
+                    (end == len(description) - 1 or not is_word_char(description[end + 1])))
+        return True
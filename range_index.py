@@ -0,0 +1,105 @@
+from datetime import date as calendar_date
+from functools import lru_cache
+from typing import Tuple
+
+# (year, month, day), same as `finance_data.Date`
+Date = Tuple[int, int, int]
+
+INITIAL_NUM_DAYS = 512
+
+
+@lru_cache(maxsize=4096)
+def get_ordinal(date: Date) -> int:
+    """Get the proleptic Gregorian ordinal of `date`."""
+    return calendar_date(*date).toordinal()
+
+
+class DayRangeIndex:
+    """
+    Per category Fenwick trees over day ordinals.
+    Adding a value and summing any inclusive range of days both take O(log days) per category.
+    The covered range of days grows by doubling when a value lands outside of it.
+    """
+
+    def __init__(self, num_categories: int):
+        self.num_categories = num_categories
+        self.first_ordinal: int | None = None
+        self.num_days = 0
+        # trees are created the first time their category receives a value
+        self.trees: list[list[int] | None] = [None] * num_categories
+
+    def add(self, date: Date, category_id: int, amount: int):
+        """Add `amount` to the value of `category_id` on `date`."""
+        ordinal = get_ordinal(date)
+        self.ensure_covers(ordinal)
+        tree = self.trees[category_id]
+        if tree is None:
+            tree = self.trees[category_id] = [0] * self.num_days
+        index = ordinal - self.first_ordinal
+        while index < self.num_days:
+            tree[index] += amount
+            index |= index + 1
+
+    def get_totals(self, start_date: Date, end_date: Date) -> list[int]:
+        """Get the total of every category between `start_date` and `end_date`, both inclusive."""
+        if self.first_ordinal is None:
+            return [0] * self.num_categories
+        end = min(get_ordinal(end_date) - self.first_ordinal, self.num_days - 1)
+        start = max(get_ordinal(start_date) - self.first_ordinal, 0)
+        if end < start:
+            return [0] * self.num_categories
+        return [self.get_prefix_sum(tree, end) - self.get_prefix_sum(tree, start - 1) if tree else 0
+                for tree in self.trees]
+
+    @staticmethod
+    def get_prefix_sum(tree: list[int], index: int) -> int:
+        """Get the sum of `tree` values from the first day up to and including `index`."""
+        total = 0
+        while index >= 0:
+            total += tree[index]
+            index = (index & (index + 1)) - 1
+        return total
+
+    def ensure_covers(self, ordinal: int):
+        """Rebuild the trees over a larger range of days if `ordinal` falls outside of the current one."""
+        if self.first_ordinal is None:
+            self.first_ordinal = ordinal
+            self.num_days = INITIAL_NUM_DAYS
+            return
+        if self.first_ordinal <= ordinal < self.first_ordinal + self.num_days:
+            return
+        num_days = self.num_days
+        first_ordinal = self.first_ordinal
+        while not first_ordinal <= ordinal < first_ordinal + num_days:
+            # double towards the new day so repeated additions in that direction stay amortized
+            if ordinal < first_ordinal:
+                first_ordinal -= num_days
+            num_days *= 2
+        offset = self.first_ordinal - first_ordinal
+        for category_id, tree in enumerate(self.trees):
+            if tree is not None:
+                values = [0] * num_days
+                values[offset:offset + self.num_days] = self.to_values(tree)
+                self.trees[category_id] = self.from_values(values)
+        self.first_ordinal = first_ordinal
+        self.num_days = num_days
+
+    @staticmethod
+    def from_values(values: list[int]) -> list[int]:
+        """Build a Fenwick tree from daily `values` in O(days)."""
+        tree = list(values)
+        for index in range(len(tree)):
+            parent = index | (index + 1)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        return tree
+
+    @staticmethod
+    def to_values(tree: list[int]) -> list[int]:
+        """Recover the daily values of a Fenwick tree built by `from_values` in O(days)."""
+        values = list(tree)
+        for index in reversed(range(len(values))):
+            parent = index | (index + 1)
+            if parent < len(values):
+                values[parent] -= values[index]
+        return values
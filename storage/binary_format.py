@@ -0,0 +1,63 @@
+import struct
+from typing import Tuple
+
+"""
+Framing shared by the binary cache files, little endian
+    header: magic: 6 bytes, version: u16
+    counts: u32
+    strings: u16 length, utf-8 bytes
+"""
+HEADER = struct.Struct('<6sH')
+LENGTH = struct.Struct('<H')
+COUNT = struct.Struct('<I')
+
+
+def pack_header(magic: bytes, version: int) -> bytes:
+    """Encode the magic and version that start a binary file."""
+    return HEADER.pack(magic, version)
+
+
+def pack_count(count: int) -> bytes:
+    """Encode a count."""
+    return COUNT.pack(count)
+
+
+def pack_string(value: str) -> bytes:
+    """Encode `value` as a length prefixed utf-8 string."""
+    encoded = value.encode()
+    return LENGTH.pack(len(encoded)) + encoded
+
+
+class BinaryReader:
+    """
+    Reads values framed by the functions above from `buffer`, starting at `offset` and moving past each value.
+    Raises `struct.error` or `UnicodeDecodeError` when the buffer ends early or holds something else.
+    """
+
+    def __init__(self, buffer: bytes | memoryview, offset: int = 0):
+        self.buffer = buffer
+        self.offset = offset
+
+    def read(self, record: struct.Struct) -> tuple:
+        """Read one `record` at the current offset."""
+        values = record.unpack_from(self.buffer, self.offset)
+        self.offset += record.size
+        return values
+
+    def read_header(self) -> Tuple[bytes, int]:
+        """Read the magic and version at the current offset."""
+        return self.read(HEADER)
+
+    def read_count(self) -> int:
+        """Read a count at the current offset."""
+        count, = self.read(COUNT)
+        return count
+
+    def read_string(self) -> str:
+        """Read a length prefixed utf-8 string at the current offset."""
+        length, = self.read(LENGTH)
+        start = self.offset
+        if start + length > len(self.buffer):
+            raise struct.error(f'string of {length} bytes at offset {start} runs past the end of the buffer')
+        self.offset = start + length
+        return bytes(self.buffer[start:self.offset]).decode()
@@ -0,0 +1,173 @@
+import json
+from calendar import monthrange
+from datetime import date as calendar_date
+from typing import Dict, Mapping, Tuple
+
+import numpy as np
+
+from finance_data import Date, FinanceData
+from views import TimespanView
+
+
+class ColumnarFinanceData(FinanceData):
+    """
+    `FinanceData` backed by a dense NumPy array of integer cents with shape (days, categories).
+    Row `i` holds the values of the day `i` days after January 1st of the first stored year,
+    column `j` holds the values of the category with id `j` in `registry`.
+    Aggregate getters are computed with array reductions instead of nested loops.
+    """
+
+    def __init__(self, default_values: Dict[str, Dict[str, float]]):
+        super().__init__(default_values)
+        self.first_year: int | None = None
+        self.last_year: int | None = None
+        self.values = np.zeros((0, len(self.registry)), dtype=np.int64)
+
+    def __str__(self):
+        return json.dumps({year: {month: self.get_day_values(year, month) for month in self.month_counts[year].keys()}
+                           for year in self.month_counts.keys()}, indent=4)
+
+    def get_years(self) -> list[int]:
+        """Get a `list` of years."""
+        return list(self.month_counts.keys())
+
+    def get_months(self) -> list[Tuple[int, int]]:
+        """Get the `list` of tuples containing all year, month combos present."""
+        return [(year, month) for year in self.month_counts.keys() for month in self.month_counts[year].keys()]
+
+    def get_overall(self) -> Dict[str, Dict[str, int]]:
+        """Get totals for each major and minor category for all time."""
+        return self.to_category_map(self.values.sum(axis=0))
+
+    def get_yearly_overall(self) -> Dict[int, Dict[str, Dict[str, int]]]:
+        """Get the totals for each major and minor category for every year in this data."""
+        years = self.get_years()
+        if not years:
+            return {}
+        year_starts = [self.get_row(year, 1, 1) for year in sorted(years)]
+        totals = dict(zip(sorted(years), np.add.reduceat(self.values, year_starts, axis=0)))
+        return {year: self.to_category_map(totals[year]) for year in years}
+
+    def get_monthly_overall(self, year: int) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """Get the totals for each major and minor category for every month in this data."""
+        return {f'{year}/{month}': self.to_category_map(self.get_month_values(year, month).sum(axis=0))
+                for month in self.month_counts[year].keys()}
+
+    def get_monthly_expenses(self, year: int) -> Mapping[str, Mapping[str, int]]:
+        """Get a read-only view of the contents of the expenses category for every month of the given year."""
+        return TimespanView(self.registry.get_minor_id_map('expenses'),
+                            {f'{year}/{month}': self.get_month_values(year, month).sum(axis=0).tolist()
+                             for month in self.month_counts[year].keys()})
+
+    def get_range_totals(self, start_date: Date, end_date: Date) -> Dict[str, Dict[str, int]]:
+        """Get the totals for each major and minor category between `start_date` and `end_date`, both inclusive."""
+        if self.first_year is None:
+            return self.to_category_map(np.zeros(len(self.registry), dtype=np.int64))
+        start = max(self.get_row(*start_date), 0)
+        end = self.get_row(*end_date) + 1
+        return self.to_category_map(self.values[start:max(end, start)].sum(axis=0))
+
+    def get_daily_expenses(self, year: int, month: int) -> Mapping[int, Mapping[str, int]]:
+        """Get a read-only view of the contents of the expenses category for every day of a given month and year."""
+        # each day is a row view of `values`, values are converted to python ints as they are read
+        month_values = self.get_month_values(year, month)
+        return TimespanView(self.registry.get_minor_id_map('expenses'),
+                            {day: RowValues(row) for day, row in enumerate(month_values, start=1)})
+
+    def add_amount(self, date: Date, category_id: int, amount: int):
+        """Add an amount in cents to the current value for the given date and category id, without counting it."""
+        self.add_date_if_not_exists(date)
+        self.values[self.get_row(*date), category_id] += amount
+
+    def merge(self, other: FinanceData) -> 'ColumnarFinanceData':
+        """Add every value in `other` to this data. Returns this object so merges can be chained."""
+        for year, month, count in other.get_month_counts():
+            self.add_month_count(year, month, count)
+        if not isinstance(other, ColumnarFinanceData) or other.first_year is None:
+            for date, major, minor, value in other.get_entries():
+                self.add_amount(date, self.registry.get_id(major, minor), value)
+            return self
+        start = self.get_row(other.first_year, 1, 1)
+        self.values[start:start + len(other.values)] += other.values
+        return self
+
+    def subtract(self, other: FinanceData) -> 'ColumnarFinanceData':
+        """Remove every value in `other` from this data. Months left without any of their values are dropped."""
+        for date, major, minor, value in other.get_entries():
+            self.add_amount(date, self.registry.get_id(major, minor), -value)
+        for year, month, count in other.get_month_counts():
+            self.add_month_count(year, month, -count)
+        return self
+
+    def remove_month(self, year: int, month: int):
+        """Remove a month whose values were all subtracted, and its year once it has no months left."""
+        del self.month_counts[year][month]
+        if not self.month_counts[year]:
+            del self.month_counts[year]
+
+    def get_entries(self) -> list[Tuple[Date, str, str, int]]:
+        """
+        Get every non-zero value as a `(date, major_category, minor_category, value)` tuple.
+        Entries follow the order years and months were added in, so `add_entries` recreates the same order.
+        """
+        entries = []
+        for year, month in self.get_months():
+            days, category_ids = np.nonzero(self.get_month_values(year, month))
+            month_values = self.get_month_values(year, month)[days, category_ids].tolist()
+            for day, category_id, value in zip(days.tolist(), category_ids.tolist(), month_values):
+                entries.append(((year, month, day + 1), *self.registry.get_category(category_id), value))
+        return entries
+
+    def add_date_if_not_exists(self, date: Date):
+        """Add a new date if it does not already exist in data."""
+        year, month, _ = date
+        if year not in self.month_counts:
+            self.add_year_rows(year)
+            self.month_counts[year] = {}
+        self.month_counts[year].setdefault(month, 0)
+
+    def add_year_rows(self, year: int):
+        """Grow `values` so that it has a row for every day of `year`."""
+        if self.first_year is None:
+            self.first_year = self.last_year = year
+            self.values = np.zeros((self.get_row(year + 1, 1, 1), len(self.registry)), dtype=np.int64)
+        elif year < self.first_year:
+            num_rows = calendar_date(self.first_year, 1, 1).toordinal() - calendar_date(year, 1, 1).toordinal()
+            padding = np.zeros((num_rows, len(self.registry)), dtype=np.int64)
+            self.values = np.concatenate((padding, self.values))
+            self.first_year = year
+        elif year > self.last_year:
+            padding = np.zeros((self.get_row(year + 1, 1, 1) - len(self.values), len(self.registry)), dtype=np.int64)
+            self.values = np.concatenate((self.values, padding))
+            self.last_year = year
+
+    def get_row(self, year: int, month: int, day: int) -> int:
+        """Get the row index of the given date."""
+        return calendar_date(year, month, day).toordinal() - calendar_date(self.first_year, 1, 1).toordinal()
+
+    def get_month_values(self, year: int, month: int) -> np.ndarray:
+        """Get the (days, categories) slice of `values` for the given month."""
+        start = self.get_row(year, month, 1)
+        _, num_days = monthrange(year, month)
+        return self.values[start:start + num_days]
+
+    def get_day_values(self, year: int, month: int) -> Dict[int, Dict[str, Dict[str, int]]]:
+        """Get the category map of every day of the given month."""
+        return {day: self.to_category_map(values)
+                for day, values in enumerate(self.get_month_values(year, month), start=1)}
+
+    def to_category_map(self, category_values: np.ndarray) -> Dict[str, Dict[str, int]]:
+        """Convert a vector of per-category values into a `{ major_category: { minor_category: value } }` map."""
+        return self.registry.to_category_map(category_values.tolist())
+
+
+class RowValues:
+    """Read-only access to a row of `values` that returns python ints instead of NumPy scalars."""
+
+    __slots__ = ('row',)
+
+    def __init__(self, row: np.ndarray):
+        self.row = row
+
+    def __getitem__(self, category_id: int) -> int:
+        return int(self.row[category_id])
@@ -0,0 +1,37 @@
+import hashlib
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def get_file_fingerprint(file_path: str) -> str:
+    """Get the sha256 hex digest of the contents of `file_path`, reading it in chunks."""
+    content_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def make_parent_dir(path: str):
+    """Create the directory of `path` if it does not exist yet."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+@contextmanager
+def atomic_write(path: str) -> Iterator[str]:
+    """
+    Get a temporary path next to `path` to write to, which replaces `path` once the `with` block completes.
+    An interrupted write leaves `path` as it was and removes the temporary file. The directory of `path` is created
+    if needed, the process id keeps the temporary files of concurrent writers apart.
+    """
+    make_parent_dir(path)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
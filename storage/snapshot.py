@@ -0,0 +1,140 @@
+import mmap
+import struct
+from typing import Dict, Iterator, Tuple
+
+from finance_data import Date, FinanceData
+from storage.binary_format import BinaryReader, pack_count, pack_header, pack_string
+from storage.files import atomic_write
+
+MAGIC = b'FTSNAP'
+# bump when the layout of the file changes
+SNAPSHOT_VERSION = 2
+
+"""
+Snapshot File Structure, little endian, values are integer cents
+    magic 'FTSNAP', version: u16
+    fingerprint: u16 length, utf-8 bytes
+    number of categories: u32, then per category id: u16 length, utf-8 major, u16 length, utf-8 minor
+    number of years: u32, then per year: year: i32, first record: u32, number of records: u32, number of months: u32
+    months grouped by year: month: u8, number of values added to it: u32
+    records grouped by year: year: u16, month: u8, day: u8, category id: u16, value: i64
+"""
+YEAR_INDEX = struct.Struct('<iIII')
+MONTH = struct.Struct('<BI')
+RECORD = struct.Struct('<HBBHq')
+
+
+def write_snapshot(finance_data: FinanceData, snapshot_file: str, fingerprint: str = ''):
+    """
+    Write the non-zero values of `finance_data` and the value count of each of its months to `snapshot_file`,
+    replacing it atomically.
+    """
+    years: Dict[int, list[bytes]] = {year: [] for year in finance_data.get_years()}
+    months: Dict[int, list[bytes]] = {year: [] for year in years}
+    for year, month, count in finance_data.get_month_counts():
+        months[year].append(MONTH.pack(month, count))
+    registry = finance_data.registry
+    for (year, month, day), major, minor, value in finance_data.get_entries():
+        years[year].append(RECORD.pack(year, month, day, registry.get_id(major, minor), value))
+
+    header = [pack_header(MAGIC, SNAPSHOT_VERSION), pack_string(fingerprint), pack_count(len(registry))]
+    for major, minor in registry.categories:
+        header += [pack_string(major), pack_string(minor)]
+    header.append(pack_count(len(years)))
+    first_record = 0
+    for year, records in years.items():
+        header.append(YEAR_INDEX.pack(year, first_record, len(records), len(months[year])))
+        first_record += len(records)
+    for year_months in months.values():
+        header += year_months
+
+    with atomic_write(snapshot_file) as temp_file, open(temp_file, 'wb') as f:
+        f.writelines(header)
+        for records in years.values():
+            f.writelines(records)
+
+
+class Snapshot:
+    """
+    Read-only view of a file written by `write_snapshot`, memory mapped so that opening it only parses the header.
+    Reading a year only touches the pages of that year.
+    Raises `ValueError` if the file is not a complete snapshot of this version.
+    """
+
+    def __init__(self, snapshot_file: str):
+        with open(snapshot_file, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.read_header(snapshot_file)
+        except (struct.error, UnicodeDecodeError) as error:
+            self.buffer.close()
+            raise ValueError(f'{snapshot_file} is truncated or corrupt') from error
+        except ValueError:
+            self.buffer.close()
+            raise
+
+    def read_header(self, snapshot_file: str):
+        """Parse the header and year index, raising `ValueError` if the file is not a snapshot of this version."""
+        reader = BinaryReader(self.buffer)
+        magic, version = reader.read_header()
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f'{snapshot_file} is not a version {SNAPSHOT_VERSION} snapshot')
+        self.fingerprint = reader.read_string()
+        self.categories: list[Tuple[str, str]] = [(reader.read_string(), reader.read_string())
+                                                  for _ in range(reader.read_count())]
+        # year -> (first record, number of records)
+        self.years: Dict[int, Tuple[int, int]] = {}
+        num_months = {}
+        for _ in range(reader.read_count()):
+            year, first_record, num_records, num_months[year] = reader.read(YEAR_INDEX)
+            self.years[year] = (first_record, num_records)
+        # year -> (month, number of values) of each of its months
+        self.months: Dict[int, list[Tuple[int, int]]] = {year: [reader.read(MONTH) for _ in range(year_months)]
+                                                          for year, year_months in num_months.items()}
+        self.records_offset = reader.offset
+        num_records = sum(num_records for _, num_records in self.years.values())
+        if len(self.buffer) < self.records_offset + num_records * RECORD.size:
+            raise ValueError(f'{snapshot_file} is truncated')
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_years(self) -> list[int]:
+        """Get the years in the snapshot, in the order they were stored."""
+        return list(self.years.keys())
+
+    def iter_records(self, year: int) -> Iterator[Tuple[int, int, int, int, int]]:
+        """
+        Iterate over the `(year, month, day, category_id, value)` records of `year`.
+        Only the records of `year` are copied out of the mapping, so the snapshot can be closed while an iterator
+        is still alive.
+        """
+        if year not in self.years:
+            return iter(())
+        first_record, num_records = self.years[year]
+        start = self.records_offset + first_record * RECORD.size
+        return RECORD.iter_unpack(self.buffer[start:start + num_records * RECORD.size])
+
+    def get_entries(self, year: int) -> Iterator[Tuple[Date, str, str, int]]:
+        """Iterate over the `(date, major_category, minor_category, value)` entries of `year`."""
+        for _, month, day, category_id, value in self.iter_records(year):
+            yield (year, month, day), *self.categories[category_id], value
+
+    def load_into(self, finance_data: FinanceData, years: list[int] = None) -> FinanceData:
+        """Add the months and values of `years`, or of every year, to `finance_data`. Returns `finance_data`."""
+        # map stored ids to the ids of the current config, categories it no longer has are dropped
+        category_ids = [finance_data.registry.ids.get(category) for category in self.categories]
+        for year in self.get_years() if years is None else years:
+            for month, count in self.months.get(year, ()):
+                finance_data.add_month_count(year, month, count)
+            for _, month, day, category_id, value in self.iter_records(year):
+                if category_ids[category_id] is not None:
+                    finance_data.add_amount((year, month, day), category_ids[category_id], value)
+        return finance_data
+
+    def close(self):
+        """Unmap the snapshot file."""
+        self.buffer.close()
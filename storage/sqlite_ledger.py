@@ -0,0 +1,311 @@
+import json
+import sqlite3
+from calendar import monthrange
+from typing import Dict, Iterable, Mapping, Tuple
+
+from finance_data import Date, FinanceData
+from range_index import get_ordinal
+from storage.files import make_parent_dir
+from views import TimespanView
+
+# rows buffered by `add_category_value` and `add_transactions` before they are inserted with one `executemany`
+BATCH_SIZE = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    major TEXT NOT NULL,
+    minor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    ordinal INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    category_id INTEGER NOT NULL REFERENCES categories (id),
+    amount INTEGER NOT NULL,
+    description TEXT,
+    file_path TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (year, month, day);
+CREATE INDEX IF NOT EXISTS transactions_ordinal ON transactions (ordinal);
+CREATE INDEX IF NOT EXISTS transactions_category ON transactions (category_id);
+CREATE INDEX IF NOT EXISTS transactions_file ON transactions (file_path);
+CREATE TABLE IF NOT EXISTS months (
+    id INTEGER PRIMARY KEY,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    UNIQUE (year, month)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+INSERT_ROW = '''
+INSERT INTO transactions (ordinal, year, month, day, category_id, amount, description, file_path)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SELECT_ROWS = '''
+SELECT ordinal, year, month, day, category_id, amount, description, file_path FROM transactions ORDER BY id
+'''
+
+# months in the order they first received a row, ledgers written before the table existed fill it from their rows
+FILL_MONTHS = '''
+INSERT OR IGNORE INTO months (year, month)
+SELECT year, month FROM transactions GROUP BY year, month ORDER BY MIN(id)
+'''
+
+# (ordinal, year, month, day, category_id, amount, description, file_path)
+Row = Tuple[int, int, int, int, int, int, str | None, str | None]
+
+
+class SqliteFinanceData(FinanceData):
+    """
+    `FinanceData` backed by a SQLite ledger with one row per transaction in integer cents.
+    Rows are buffered and bulk inserted with `executemany` inside a single transaction that `close` commits.
+    The ledger is indexed on date and category, aggregate getters are answered with `GROUP BY` queries.
+    A `database_file` other than `:memory:` keeps the ledger between runs, it is cleared when the config
+    categories no longer match the ones it was written with. Otherwise rows are only deleted together with the other
+    rows of their file, and a month exists as long as it has rows. The id of the snapshot saved along with the ledger
+    is stored in it, so the next run can keep the ledger without comparing it to the snapshot.
+    """
+
+    keeps_transactions = True
+
+    def __init__(self, default_values: Dict[str, Dict[str, float]], database_file: str = ':memory:'):
+        super().__init__(default_values)
+        self.database_file = database_file
+        self.expenses_ids = self.registry.get_ids('expenses')
+        self.pending_rows: list[Row] = []
+        if database_file != ':memory:':
+            make_parent_dir(database_file)
+        # partial data from worker processes is unpickled on the process pool's result thread, it is only ever
+        # used by one thread at a time
+        self.connection = sqlite3.connect(database_file, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.sync_categories()
+        if not self.connection.execute('SELECT 1 FROM months LIMIT 1').fetchone():
+            with self.connection:
+                self.connection.execute(FILL_MONTHS)
+
+    def __getstate__(self):
+        # connections can't be pickled, partial data sent back from worker processes carries its rows instead
+        self.flush()
+        return {'default_values': self.default_values, 'rows': self.connection.execute(SELECT_ROWS).fetchall()}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['default_values'])
+        self.pending_rows = state['rows']
+
+    def __str__(self):
+        named_data = {}
+        for (year, month, day), major, minor, value in self.get_entries():
+            day_values = named_data.setdefault(year, {}).setdefault(month, {}).setdefault(day, {})
+            day_values.setdefault(major, {})[minor] = value
+        return json.dumps(named_data, indent=4)
+
+    def sync_categories(self):
+        """Write the categories of `registry` to the ledger, clearing it if they differ from the stored ones."""
+        stored = self.connection.execute('SELECT major, minor FROM categories ORDER BY id').fetchall()
+        if stored == self.registry.categories:
+            return
+        with self.connection:
+            self.connection.execute('DELETE FROM transactions')
+            self.connection.execute('DELETE FROM months')
+            self.connection.execute('DELETE FROM categories')
+            self.connection.execute('DELETE FROM meta')
+            self.connection.executemany('INSERT INTO categories (id, major, minor) VALUES (?, ?, ?)',
+                                        [(category_id, major, minor)
+                                         for category_id, (major, minor) in enumerate(self.registry.categories)])
+
+    def query(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        """Insert any buffered rows, then run `sql` and fetch every result row."""
+        self.flush()
+        return self.connection.execute(sql, parameters).fetchall()
+
+    def flush(self):
+        """Insert the buffered rows. They stay part of the open transaction until `close` commits it."""
+        if self.pending_rows:
+            self.insert_rows(self.pending_rows)
+            self.pending_rows = []
+
+    def insert_rows(self, rows: list[Row]):
+        """Insert `rows`, adding the months that did not have rows yet after the others."""
+        self.connection.executemany(INSERT_ROW, rows)
+        self.connection.executemany('INSERT OR IGNORE INTO months (year, month) VALUES (?, ?)',
+                                    dict.fromkeys((row[1], row[2]) for row in rows))
+
+    def close(self):
+        """Commit every inserted row and close the ledger."""
+        self.flush()
+        self.connection.commit()
+        self.connection.close()
+
+    def get_years(self) -> list[int]:
+        """Get a `list` of years."""
+        return list(dict.fromkeys(year for year, _ in self.get_months()))
+
+    def get_months(self) -> list[Tuple[int, int]]:
+        """Get the `list` of tuples containing all year, month combos present."""
+        months = self.query('SELECT year, month FROM months ORDER BY id')
+        # group months by year, years and months each in the order they first received a value
+        year_order = {year: index for index, year in enumerate(dict.fromkeys(year for year, _ in months))}
+        return sorted(months, key=lambda year_month: year_order[year_month[0]])
+
+    def get_overall(self) -> Dict[str, Dict[str, int]]:
+        """Get totals for each major and minor category for all time."""
+        return self.to_category_map(
+            self.query('SELECT category_id, SUM(amount) FROM transactions GROUP BY category_id'))
+
+    def get_yearly_overall(self) -> Dict[int, Dict[str, Dict[str, int]]]:
+        """Get the totals for each major and minor category for every year in this data."""
+        totals = {year: [] for year in self.get_years()}
+        for year, category_id, value in self.query(
+                'SELECT year, category_id, SUM(amount) FROM transactions GROUP BY year, category_id'):
+            totals[year].append((category_id, value))
+        return {year: self.to_category_map(year_totals) for year, year_totals in totals.items()}
+
+    def get_monthly_overall(self, year: int) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """Get the totals for each major and minor category for every month in this data."""
+        totals = {month: [] for month in self.get_year_months(year)}
+        for month, category_id, value in self.query(
+                'SELECT month, category_id, SUM(amount) FROM transactions WHERE year = ? GROUP BY month, category_id',
+                (year,)):
+            totals[month].append((category_id, value))
+        return {f'{year}/{month}': self.to_category_map(month_totals) for month, month_totals in totals.items()}
+
+    def get_monthly_expenses(self, year: int) -> Mapping[str, Mapping[str, int]]:
+        """Get a read-only view of the contents of the expenses category for every month of the given year."""
+        totals = {month: {} for month in self.get_year_months(year)}
+        for month, category_id, value in self.query(
+                'SELECT month, category_id, SUM(amount) FROM transactions '
+                f'WHERE year = ? AND category_id IN ({self.get_expenses_placeholders()}) '
+                'GROUP BY month, category_id', (year, *self.expenses_ids)):
+            totals[month][category_id] = value
+        return TimespanView(self.registry.get_minor_id_map('expenses'),
+                            {f'{year}/{month}': month_totals for month, month_totals in totals.items()})
+
+    def get_range_totals(self, start_date: Date, end_date: Date) -> Dict[str, Dict[str, int]]:
+        """Get the totals for each major and minor category between `start_date` and `end_date`, both inclusive."""
+        return self.to_category_map(self.query(
+            'SELECT category_id, SUM(amount) FROM transactions WHERE ordinal BETWEEN ? AND ? GROUP BY category_id',
+            (get_ordinal(start_date), get_ordinal(end_date))))
+
+    def get_daily_expenses(self, year: int, month: int) -> Mapping[int, Mapping[str, int]]:
+        """Get a read-only view of the contents of the expenses category for every day of a given month and year."""
+        _, num_days = monthrange(year, month)
+        totals = {day: {} for day in range(1, num_days + 1)}
+        for day, category_id, value in self.query(
+                'SELECT day, category_id, SUM(amount) FROM transactions '
+                f'WHERE year = ? AND month = ? AND category_id IN ({self.get_expenses_placeholders()}) '
+                'GROUP BY day, category_id', (year, month, *self.expenses_ids)):
+            totals[day][category_id] = value
+        return TimespanView(self.registry.get_minor_id_map('expenses'), totals)
+
+    def get_year_months(self, year: int) -> list[int]:
+        """Get the months of `year` in the order they first received a value."""
+        return [month for month_year, month in self.get_months() if month_year == year]
+
+    def get_expenses_placeholders(self) -> str:
+        """Get one `?` placeholder per expenses category id."""
+        return ', '.join('?' * len(self.expenses_ids))
+
+    def add_category_value(self, date: Date, category_id: int, amount: int):
+        """Add an amount in cents to the current value for the given date and category id."""
+        self.add_row((get_ordinal(date), *date, category_id, amount, None, None))
+
+    def add_amount(self, date: Date, category_id: int, amount: int):
+        """Add an amount in cents as its own ledger row, rows are what make a month exist."""
+        self.add_category_value(date, category_id, amount)
+
+    def get_month_counts(self) -> list[Tuple[int, int, int]]:
+        """Get the `(year, month, count)` of every month, in the order of `get_months`."""
+        counts = {(year, month): count for year, month, count in
+                  self.query('SELECT year, month, COUNT(*) FROM transactions GROUP BY year, month')}
+        return [(year, month, counts[year, month]) for year, month in self.get_months()]
+
+    def add_month_count(self, year: int, month: int, count: int):
+        """Months of the ledger exist as long as they have rows, so there is no count to keep."""
+
+    def add_transactions(self, transactions: Iterable) -> 'SqliteFinanceData':
+        """Add each classified transaction as its own ledger row, keeping its description and file."""
+        for transaction in transactions:
+            self.add_row((get_ordinal(transaction.date), *transaction.date, transaction.category_id,
+                          transaction.value, transaction.desc, transaction.file_path))
+        return self
+
+    def add_row(self, row: Row):
+        """Buffer `row`, inserting the buffer once it holds `BATCH_SIZE` rows."""
+        self.pending_rows.append(row)
+        if len(self.pending_rows) >= BATCH_SIZE:
+            self.flush()
+
+    def merge(self, other: FinanceData) -> 'SqliteFinanceData':
+        """Add every value in `other` to this data. Returns this object so merges can be chained."""
+        if not isinstance(other, SqliteFinanceData):
+            return self.add_entries(other.get_entries())
+        # copy the ledger rows so descriptions and files survive merging partial data
+        self.flush()
+        self.insert_rows(other.query(SELECT_ROWS))
+        return self
+
+    def subtract(self, other: FinanceData) -> 'SqliteFinanceData':
+        """
+        Remove every value in `other` from this data by adding rows with the negated values.
+        Rows are never deleted for it, so the months of `other` stay as long as they have rows.
+        """
+        for date, major, minor, value in other.get_entries():
+            self.add_value(date, major, minor, -value)
+        return self
+
+    def remove_file(self, file_path: str, contribution: FinanceData):
+        """Delete the ledger rows of `file_path`, or subtract `contribution` if the ledger has no rows of it."""
+        self.flush()
+        if self.connection.execute('DELETE FROM transactions WHERE file_path = ?', (file_path,)).rowcount:
+            # only the order of the months the file had is forgotten, the rows of other files stay
+            self.connection.execute('''
+                DELETE FROM months WHERE NOT EXISTS (
+                    SELECT 1 FROM transactions
+                    WHERE transactions.year = months.year AND transactions.month = months.month
+                )
+            ''')
+        else:
+            self.subtract(contribution)
+
+    def clear(self):
+        """Delete every row of the ledger and the snapshot id stored with them."""
+        self.flush()
+        self.connection.execute('DELETE FROM transactions')
+        self.connection.execute('DELETE FROM months')
+        self.connection.execute("DELETE FROM meta WHERE key = 'snapshot'")
+
+    def has_snapshot(self, snapshot_id: str) -> bool:
+        """Check whether the stored ledger was committed along with the snapshot saved as `snapshot_id`."""
+        stored = self.connection.execute("SELECT value FROM meta WHERE key = 'snapshot'").fetchone()
+        return stored is not None and stored[0] == snapshot_id
+
+    def set_snapshot(self, snapshot_id: str):
+        """Store `snapshot_id` in the ledger, it is committed by `close` along with the rows it describes."""
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('snapshot', ?)", (snapshot_id,))
+
+    def get_entries(self) -> list[Tuple[Date, str, str, int]]:
+        """
+        Get every non-zero value as a `(date, major_category, minor_category, value)` tuple.
+        Entries follow the order years and months were added in, so `add_entries` recreates the same order.
+        """
+        return [((year, month, day), *self.registry.get_category(category_id), value)
+                for year, month, day, category_id, value in self.query('''
+                    SELECT year, month, day, category_id, SUM(amount) FROM transactions
+                    GROUP BY year, month, day, category_id HAVING SUM(amount) != 0 ORDER BY MIN(id)
+                ''')]
+
+    def to_category_map(self, totals: Iterable[Tuple[int, int]]) -> Dict[str, Dict[str, int]]:
+        """Convert `(category_id, value)` pairs into a zero filled `{ major_category: { minor_category: value } }`."""
+        values = [0] * len(self.registry)
+        for category_id, value in totals:
+            values[category_id] = value
+        return self.registry.to_category_map(values)
@@ -0,0 +1,58 @@
+from typing import Dict, Iterator, Mapping, Sequence
+
+# values keyed or indexed by category id, sparse mappings leave out categories whose value is zero
+CategoryValues = Mapping[int, int] | Sequence[int]
+
+
+class CategoryValuesView(Mapping[str, int]):
+    """
+    Read-only `{ minor_category: value }` view over the per category id values of a single timespan.
+    Values are looked up in the underlying storage on access instead of being copied.
+    """
+
+    __slots__ = ('category_ids', 'values')
+
+    def __init__(self, category_ids: Dict[str, int], values: CategoryValues):
+        self.category_ids = category_ids
+        self.values = values
+
+    def __getitem__(self, minor_category: str) -> int:
+        category_id = self.category_ids[minor_category]
+        try:
+            return self.values[category_id]
+        except KeyError:
+            return 0
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.category_ids)
+
+    def __len__(self) -> int:
+        return len(self.category_ids)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class TimespanView(Mapping[str | int, CategoryValuesView]):
+    """
+    Read-only `{ timespan: { minor_category: value } }` view over the category values of each timespan.
+    Only the small per timespan views are created up front, the values stay in the underlying storage.
+    """
+
+    __slots__ = ('timespans',)
+
+    def __init__(self, category_ids: Dict[str, int], timespan_values: Dict[str | int, CategoryValues]):
+        self.timespans = {timespan: CategoryValuesView(category_ids, values)
+                          for timespan, values in timespan_values.items()}
+
+    def __getitem__(self, timespan: str | int) -> CategoryValuesView:
+        return self.timespans[timespan]
+
+    def __iter__(self) -> Iterator[str | int]:
+        return iter(self.timespans)
+
+    def __len__(self) -> int:
+        return len(self.timespans)
+
+    def __repr__(self) -> str:
+        return repr({timespan: dict(values) for timespan, values in self.items()})
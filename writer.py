@@ -1,12 +1,35 @@
-from typing import Dict
+import hashlib
+import json
+import os
+import re
+import zipfile
+from contextlib import contextmanager
+from typing import Collection, Dict, Iterator
+from xml.etree import ElementTree
 
 import xlsxwriter
 
 from finance_data import FinanceData
+from storage.files import atomic_write
 from writers import overall_data_writer, monthly_expenses_writer, daily_expenses_writer, sankey
 from writers.styles import Styles, create_styles_map_for_overall_data, merge_styles_with_defaults
 
 FILE_NAME = 'output.xlsx'
+# stream each worksheet's rows to a temporary file as they are completed instead of keeping every cell in memory,
+# this requires tables to be written row by row from top to bottom
+CONSTANT_MEMORY = True
+
+# write one workbook per year into `SHARD_DIR` along with an all time index workbook instead of a single `FILE_NAME`,
+# a shard is only rewritten when the hash of the data it was built from changes
+SHARDED_OUTPUT = False
+SHARD_DIR = 'output'
+INDEX_FILE_NAME = 'index.xlsx'
+# workbook custom property that tags each shard with the hash of its data
+DATA_HASH_PROPERTY = 'data_hash'
+# bump when the layout of the workbooks changes, so that every shard is rewritten
+SHARD_LAYOUT_VERSION = 1
+ALL_TIME = 'ALL_TIME'
+shard_file_pattern = re.compile(r'\d+\.xlsx')
 
 
 def create_xlsx_file(finance_data: FinanceData, custom_styles: Styles, description_map: Dict[str, str]):
@@ -14,8 +37,126 @@ def create_xlsx_file(finance_data: FinanceData, custom_styles: Styles, descripti
     overall_styles = create_styles_map_for_overall_data(finance_data.get_categories())
     expenses_styles = merge_styles_with_defaults(finance_data.get_minor_categories('expenses'), custom_styles)
 
-    workbook = xlsxwriter.Workbook(FILE_NAME)
-    overall_data_writer.create_overall_worksheets(workbook, finance_data, overall_styles)
+    # render the sankey plots of all years up front, in parallel, so the workbook only has to reference them
+    sankey_data = finance_data.get_yearly_overall()
+    if SHARDED_OUTPUT:
+        # the index workbook shows the sankey plot of all years together
+        sankey_data[ALL_TIME] = finance_data.get_overall()
+    sankey_images = sankey.create_sankey_plots_for_yearly_data(sankey_data)
+
+    if SHARDED_OUTPUT:
+        create_sharded_xlsx_files(finance_data, overall_styles, expenses_styles, sankey_images)
+        return
+
+    workbook = xlsxwriter.Workbook(FILE_NAME, {'constant_memory': CONSTANT_MEMORY})
+    overall_data_writer.create_overall_worksheets(workbook, finance_data, overall_styles, sankey_images)
     monthly_expenses_writer.create_monthly_expenses_worksheets(workbook, finance_data, expenses_styles)
     daily_expenses_writer.create_daily_expenses_worksheets(workbook, finance_data, expenses_styles)
     workbook.close()
+
+
+def create_sharded_xlsx_files(finance_data: FinanceData,
+                              overall_styles: Styles,
+                              expenses_styles: Styles,
+                              sankey_images: Dict[str, str]):
+    """
+    Write a workbook per year and the index workbook into `SHARD_DIR`, skipping those whose data hash is unchanged.
+    Workbooks of years that are no longer in `finance_data` are removed.
+    """
+    years = finance_data.get_years()
+    styles = [overall_styles, expenses_styles]
+
+    entries_by_year = {year: [] for year in years}
+    for date, major_category, minor_category, value in finance_data.get_entries():
+        entries_by_year[date[0]].append((date, major_category, minor_category, value))
+    months_by_year = {year: [] for year in years}
+    for year, month in finance_data.get_months():
+        months_by_year[year].append(month)
+
+    for year in years:
+        # sankey image paths are already content addressed by the year's totals and the renderer
+        data_hash = get_data_hash(styles, sankey_images[year], months_by_year[year], sorted(entries_by_year[year]))
+        path = get_shard_path(year)
+        if read_data_hash(path) != data_hash:
+            create_year_xlsx_file(path, data_hash, finance_data, year, overall_styles, expenses_styles, sankey_images)
+
+    yearly_overall = finance_data.get_yearly_overall()
+    index_hash = get_data_hash(styles, sankey_images[ALL_TIME], [[year, yearly_overall[year]] for year in years])
+    index_path = f'{SHARD_DIR}/{INDEX_FILE_NAME}'
+    if read_data_hash(index_path) != index_hash:
+        create_index_xlsx_file(index_path, index_hash, years, yearly_overall, overall_styles, sankey_images[ALL_TIME])
+
+    shard_names = {os.path.basename(get_shard_path(year)) for year in years}
+    for file_name in os.listdir(SHARD_DIR):
+        if shard_file_pattern.fullmatch(file_name) and file_name not in shard_names:
+            os.remove(os.path.join(SHARD_DIR, file_name))
+
+
+def create_year_xlsx_file(path: str,
+                          data_hash: str,
+                          finance_data: FinanceData,
+                          year: str,
+                          overall_styles: Styles,
+                          expenses_styles: Styles,
+                          sankey_images: Dict[str, str]):
+    """Create the workbook with the summary, monthly and daily expenses worksheets of `year`."""
+    years = [year]
+    with open_tagged_workbook(path, data_hash) as workbook:
+        overall_data_writer.create_overall_worksheets(workbook, finance_data, overall_styles, sankey_images, years)
+        monthly_expenses_writer.create_monthly_expenses_worksheets(workbook, finance_data, expenses_styles, years)
+        daily_expenses_writer.create_daily_expenses_worksheets(workbook, finance_data, expenses_styles, years)
+
+
+def create_index_xlsx_file(path: str,
+                           data_hash: str,
+                           years: Collection[str],
+                           yearly_overall: Dict[str, Dict[str, Dict[str, int]]],
+                           overall_styles: Styles,
+                           sankey_image: str):
+    """Create the index workbook with the overall data by year and a link to the workbook of each year."""
+    with open_tagged_workbook(path, data_hash) as workbook:
+        overall_data_writer.create_overall_data_worksheet(
+            workbook, f'{ALL_TIME}_SUMMARY', {f'{year}': yearly_overall[year] for year in years}, sankey_image,
+            overall_styles)
+        worksheet = workbook.add_worksheet('YEARS')
+        for row, year in enumerate(years):
+            worksheet.write_url(row, 0, f'external:{os.path.basename(get_shard_path(year))}', string=f'{year}')
+
+
+@contextmanager
+def open_tagged_workbook(path: str, data_hash: str) -> Iterator[xlsxwriter.Workbook]:
+    """
+    Open a workbook tagged with `data_hash` that is written to `path` once the `with` block completes.
+    It is written next to `path` first and then moved into place, so an interrupted write never leaves a workbook
+    that looks up to date.
+    """
+    with atomic_write(path) as temp_path:
+        workbook = xlsxwriter.Workbook(temp_path, {'constant_memory': CONSTANT_MEMORY})
+        workbook.set_custom_property(DATA_HASH_PROPERTY, data_hash)
+        yield workbook
+        workbook.close()
+
+
+def get_shard_path(year: str) -> str:
+    """Get the path of the workbook for `year`."""
+    return f'{SHARD_DIR}/{year}.xlsx'
+
+
+def get_data_hash(*parts) -> str:
+    """Get the hash of the json form of `parts` along with `SHARD_LAYOUT_VERSION`."""
+    # numpy backed storage returns numpy integers, which json does not know
+    data = json.dumps([SHARD_LAYOUT_VERSION, *parts], default=int)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def read_data_hash(path: str) -> str | None:
+    """Get the data hash a workbook was tagged with, or `None` if it is missing or has no tag."""
+    try:
+        with zipfile.ZipFile(path) as workbook_zip:
+            properties = ElementTree.fromstring(workbook_zip.read('docProps/custom.xml'))
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+        return None
+    for workbook_property in properties:
+        if workbook_property.get('name') == DATA_HASH_PROPERTY and len(workbook_property):
+            return workbook_property[0].text
+    return None
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Collection, Mapping
 
 import xlsxwriter
 
@@ -8,9 +8,14 @@ from writers.tables import ExpensesTable
 from writers.styles import Styles
 
 
-def create_daily_expenses_worksheets(workbook: xlsxwriter.Workbook, finance_data: FinanceData, styles_map: Styles):
-    """Create a new worksheet for every month and populate it with expeneses data."""
+def create_daily_expenses_worksheets(workbook: xlsxwriter.Workbook,
+                                     finance_data: FinanceData,
+                                     styles_map: Styles,
+                                     years: Collection[str] = None):
+    """Create a new worksheet for every month, or for every month of `years`, and populate it with expeneses data."""
     for year, month in finance_data.get_months():
+        if years is not None and year not in years:
+            continue
         daily_expenses = finance_data.get_daily_expenses(year, month)
         create_daily_expenses_worksheet(
             workbook, f'{year}-{month}_EXPENSES', daily_expenses, styles_map)
@@ -18,7 +23,7 @@ def create_daily_expenses_worksheets(workbook: xlsxwriter.Workbook, finance_data
 
 def create_daily_expenses_worksheet(workbook: xlsxwriter.Workbook,
                                     worksheet_name: str,
-                                    daily_expenses: Dict[str, Dict[str, float]],
+                                    daily_expenses: Mapping[int, Mapping[str, int]],
                                     styles_map: Styles):
     """Create a worksheet and populate it with expenses by day from the given month."""
     worksheet = workbook.add_worksheet(worksheet_name)
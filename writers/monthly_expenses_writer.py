@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Collection, Mapping
 
 from finance_data import FinanceData
 from xlsxwriter import Workbook
@@ -10,9 +10,12 @@ from writers.styles import Styles
 Worksheet = Workbook.worksheet_class
 
 
-def create_monthly_expenses_worksheets(workbook: Workbook, finance_data: FinanceData, styles_map: Styles):
-    """Create a new worksheet for every year and populate it with expeneses data."""
-    for year in finance_data.get_years():
+def create_monthly_expenses_worksheets(workbook: Workbook,
+                                       finance_data: FinanceData,
+                                       styles_map: Styles,
+                                       years: Collection[str] = None):
+    """Create a new worksheet for every year, or for each of `years`, and populate it with expeneses data."""
+    for year in finance_data.get_years() if years is None else years:
         monthly_expenses = finance_data.get_monthly_expenses(year)
         create_monthly_expenses_worksheet(
             workbook, f'{year}_EXPENSES', monthly_expenses, styles_map)
@@ -20,7 +23,7 @@ def create_monthly_expenses_worksheets(workbook: Workbook, finance_data: Finance
 
 def create_monthly_expenses_worksheet(workbook: Workbook,
                                       worksheet_name: str,
-                                      monthly_expenses: Dict[str, Dict[str, float]],
+                                      monthly_expenses: Mapping[str, Mapping[str, int]],
                                       styles_map: Styles):
     """Create a worksheet and populate it with expenses by month from the given year."""
     worksheet = workbook.add_worksheet(worksheet_name)
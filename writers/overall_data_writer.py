@@ -1,9 +1,9 @@
-from typing import Dict
+from typing import Collection, Dict
 
 from xlsxwriter import Workbook
 
 from finance_data import FinanceData
-from writers import writer_utils, sankey
+from writers import writer_utils
 from writers.tables import OverallTable
 from writers.styles import Styles
 
@@ -11,19 +11,24 @@ OVERALL_DATA_WORKSHEET_NAME = 'OVERALL_DATA'
 DEFAULT_COLUMN_WIDTH = 15
 
 
-def create_overall_worksheets(workbook: Workbook, finance_data: FinanceData, styles_map: Styles):
-    """Create a new worksheet for every year and populate it with the overall data for that year."""
-    yearly_totals = finance_data.get_yearly_overall()
-    for year in finance_data.get_years():
+def create_overall_worksheets(workbook: Workbook,
+                              finance_data: FinanceData,
+                              styles_map: Styles,
+                              sankey_images: Dict[str, str],
+                              years: Collection[str] = None):
+    """
+    Create a new worksheet for every year, or for each of `years`, and populate it with the overall data for that year.
+    `sankey_images` maps each year to its already rendered sankey plot.
+    """
+    for year in finance_data.get_years() if years is None else years:
         monthly_totals = finance_data.get_monthly_overall(year)
-        year_totals = yearly_totals[year]
-        create_overall_data_worksheet(workbook, f'{year}_SUMMARY', monthly_totals, year_totals, styles_map)
+        create_overall_data_worksheet(workbook, f'{year}_SUMMARY', monthly_totals, sankey_images[year], styles_map)
 
 
 def create_overall_data_worksheet(workbook: Workbook,
                                   worksheet_name: str,
-                                  monthly_totals: Dict[str, Dict[str, Dict[str, float]]],
-                                  year_totals: Dict[str, Dict[str, float]],
+                                  monthly_totals: Dict[str, Dict[str, Dict[str, int]]],
+                                  sankey_image: str,
                                   styles_map: Styles):
     """Create a new worksheet and populate it with the overall data by month."""
     worksheet = workbook.add_worksheet(worksheet_name)
@@ -48,5 +53,4 @@ def create_overall_data_worksheet(workbook: Workbook,
         workbook, worksheet, worksheet_name, table, table.get_series_for_totals_chart(),
         totals_chart_row, totals_chart_col)
 
-    img_path = sankey.create_sankey_plot_for_overall_data(year_totals)
-    worksheet.insert_image('A45', img_path)
+    worksheet.insert_image('A45', sankey_image)
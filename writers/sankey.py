@@ -1,14 +1,69 @@
+import hashlib
+import json
 import os
-from typing import Dict
-import plotly.graph_objects as go
-from plotly.graph_objects import Figure
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Dict, Iterable
+
+from finance_data import cents_to_dollars
+from storage.files import atomic_write
+from writers.sankey_renderer import SankeyData, write_sankey_png
+
+if TYPE_CHECKING:
+    from plotly.graph_objects import Figure
 
 IMAGE_DIR = 'images'
-show_interactive_figure = True
+# open the interactive plotly figure of every year in the browser once the images are rendered, this blocks on
+# the browser for each figure and needs plotly
+show_interactive_figure = False
+# 'native' draws the png in pure python, 'plotly' renders the plotly figure with kaleido's headless chromium
+RENDERER = 'native'
+# with the plotly renderer, each worker starts its own headless chromium once, then renders its share of the years
+RENDER_WORKERS = os.cpu_count() or 1
+
+# major categories drawn in the sankey plot, the image of a year is named by a hash of their totals
+SANKEY_CATEGORIES = ('income', 'expenses')
+IMAGE_PREFIX = 'sankey-'
+
+
+def create_sankey_plots_for_yearly_data(yearly_overall_data: Dict[str, Dict[str, Dict[str, int]]],
+                                        workers: int = RENDER_WORKERS) -> Dict[str, str]:
+    """
+    Create the sankey plot for every year of `yearly_overall_data`. Get the image path of each year.
+    Years whose totals already have an image reuse it, the others are rendered in a process pool.
+    """
+    renderer = RENDERER
+    image_paths = {year: get_image_path(year_data, renderer) for year, year_data in yearly_overall_data.items()}
+    missing = {}
+    for year, path in image_paths.items():
+        if not os.path.exists(path):
+            missing.setdefault(path, yearly_overall_data[year])
 
+    if workers <= 1 or len(missing) <= 1:
+        for year_data in missing.values():
+            create_sankey_plot_for_overall_data(year_data, renderer)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(missing))) as executor:
+            list(executor.map(partial(create_sankey_plot_for_overall_data, renderer=renderer), missing.values()))
+    remove_unused_images(image_paths.values())
 
-def create_sankey_plot_for_overall_data(category_overall_data: Dict[str, Dict[str, float]]):
+    if show_interactive_figure:
+        for year_data in yearly_overall_data.values():
+            create_sankey_figure(year_data).show()
+    return image_paths
+
+
+def create_sankey_plot_for_overall_data(category_overall_data: Dict[str, Dict[str, int]],
+                                        renderer: str = RENDERER) -> str:
     """Create sankey plot for `category_overall_data`. Get the file path to the generated image."""
+    path = get_image_path(category_overall_data, renderer)
+    if not os.path.exists(path):
+        write_image_file(category_overall_data, path, renderer)
+    return path
+
+
+def get_sankey_data(category_overall_data: Dict[str, Dict[str, int]]) -> SankeyData:
+    """Get the nodes and links of the sankey plot for `category_overall_data`."""
     # data
     label = []
     source = []
@@ -21,7 +76,7 @@ def create_sankey_plot_for_overall_data(category_overall_data: Dict[str, Dict[st
         label.append(minor_category)
         source.append(index)
         target.append(total_income_index)
-        value.append(category_overall_data['income'][minor_category])
+        value.append(cents_to_dollars(category_overall_data['income'][minor_category]))
 
     label.append('Total Income')
 
@@ -29,23 +84,46 @@ def create_sankey_plot_for_overall_data(category_overall_data: Dict[str, Dict[st
         label.append(minor_category)
         source.append(total_income_index)
         target.append(index)
-        value.append(category_overall_data['expenses'][minor_category])
+        value.append(cents_to_dollars(category_overall_data['expenses'][minor_category]))
+
+    return SankeyData(label, source, target, value)
+
 
+def create_sankey_figure(category_overall_data: Dict[str, Dict[str, int]]) -> 'Figure':
+    """Create the plotly sankey figure for `category_overall_data`."""
+    # plotly is only needed by the plotly renderer and the interactive figures
+    import plotly.graph_objects as go
+    label, source, target, value = get_sankey_data(category_overall_data)
     # data to dict, dict to sankey
     link = dict(source=source, target=target, value=value)
     node = dict(label=label, pad=50, thickness=5)
     data = go.Sankey(link=link, node=node)
-    # plot
-    fig = go.Figure(data)
-    if show_interactive_figure:
-        fig.show()
-    return write_image_file(fig)
+    return go.Figure(data)
+
 
+def get_image_path(category_overall_data: Dict[str, Dict[str, int]], renderer: str = RENDERER) -> str:
+    """Get the path of the image for `category_overall_data`, named by a hash of the renderer and totals it draws."""
+    totals = [[major_category, minor_category, int(value)]
+              for major_category in SANKEY_CATEGORIES
+              for minor_category, value in category_overall_data[major_category].items()]
+    digest = hashlib.sha256(json.dumps([renderer, totals]).encode()).hexdigest()[:16]
+    return f'{IMAGE_DIR}/{IMAGE_PREFIX}{digest}.png'
 
-def write_image_file(figure: Figure) -> str:
-    """Write image file and get the image path."""
+
+def write_image_file(category_overall_data: Dict[str, Dict[str, int]], path: str, renderer: str = RENDERER):
+    """Write the image of `category_overall_data` to `path`, replacing it at once so a partial image is never cached."""
+    with atomic_write(path) as temp_path:
+        if renderer == 'plotly':
+            create_sankey_figure(category_overall_data).write_image(temp_path, format='png')
+        else:
+            write_sankey_png(get_sankey_data(category_overall_data), temp_path)
+
+
+def remove_unused_images(image_paths: Iterable[str]):
+    """Remove the sankey images in `IMAGE_DIR` that are not in `image_paths`, so the cache does not keep growing."""
     if not os.path.exists(IMAGE_DIR):
-        os.mkdir(IMAGE_DIR)
-    path = f'{IMAGE_DIR}/sankey1.png'
-    figure.write_image(path)
-    return path
+        return
+    keep = {os.path.basename(path) for path in image_paths}
+    for file_name in os.listdir(IMAGE_DIR):
+        if file_name.startswith(IMAGE_PREFIX) and file_name not in keep:
+            os.remove(os.path.join(IMAGE_DIR, file_name))
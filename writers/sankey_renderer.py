@@ -0,0 +1,232 @@
+import struct
+import unicodedata
+import zlib
+from functools import lru_cache
+from math import ceil
+from typing import Dict, List, NamedTuple, Tuple
+
+# RGB
+Color = Tuple[int, int, int]
+
+WIDTH = 700
+HEIGHT = 500
+MARGIN = 20
+NODE_THICKNESS = 5
+NODE_PAD = 50
+LABEL_GAP = 6
+FONT_SCALE = 2
+BACKGROUND: Color = (255, 255, 255)
+TEXT_COLOR: Color = (42, 63, 95)
+LINK_COLOR: Color = (0, 0, 0)
+LINK_ALPHA = 0.2
+# plotly's default colorway, which its sankey nodes cycle through
+NODE_COLORS: List[Color] = [(99, 110, 250), (239, 85, 59), (0, 204, 150), (171, 99, 250), (255, 161, 90),
+                            (25, 211, 243), (255, 102, 146), (182, 232, 128), (255, 151, 255), (254, 203, 82)]
+
+# 5x7 bitmap font for the printable ascii characters from ' ' to '~', 5 column bytes per character
+# with the top row in the lowest bit
+FONT = bytes.fromhex(
+    '000000000000005F00000007000700147F147F14242A7F2A12231308646236495522500005030000001C2241000041221C00'
+    '082A1C2A0808083E080800503000000808080808006060000020100804023E5149453E00427F400042615149462141454B31'
+    '1814127F1027454545393C4A49493001710905033649494936064949291E0036360000005636000000081422411414141414'
+    '41221408000201510906324979413E7E1111117E7F494949363E414141227F4141221C7F494949417F090901013E41415132'
+    '7F0808087F00417F41002040413F017F081422417F404040407F0204027F7F0408107F3E4141413E7F090909063E4151215E'
+    '7F09192946464949493101017F01013F4040403F1F2040201F7F2018207F63140814630304780403615149454300007F4141'
+    '020408102041417F000004020102044040404040000102040020545454787F484444383844444420384444487F3854545418'
+    '087E090102081454543C7F0804047800447D40002040443D00007F10284400417F40007C041804787C080404783844444438'
+    '7C14141408081414187C7C080404084854545420043F4440203C4040207C1C2040201C3C4030403C44281028440C5050503C'
+    '4464544C44000836410000007F000000413608000804081008')
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+
+
+class SankeyData(NamedTuple):
+    """Nodes and links of a sankey diagram, in the form plotly's `go.Sankey` takes them."""
+    label: List[str]
+    source: List[int]
+    target: List[int]
+    value: List[float]
+
+
+class Box(NamedTuple):
+    """Pixel bounds of a node."""
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+
+class Canvas:
+    """RGB image stored as a `bytearray` of rows, with just the drawing operations a sankey diagram needs."""
+
+    def __init__(self, width: int, height: int, background: Color = BACKGROUND):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(bytes(background) * (width * height))
+
+    def blend(self, x: int, y: int, color: Color, alpha: float):
+        """Blend `color` over the pixel at `x`, `y` with opacity `alpha`."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            index = (y * self.width + x) * 3
+            for channel in range(3):
+                old = self.pixels[index + channel]
+                self.pixels[index + channel] = round(old + (color[channel] - old) * alpha)
+
+    def fill_rect(self, x0: int, y0: int, x1: int, y1: int, color: Color):
+        """Fill the pixels from `x0`, `y0` up to but excluding `x1`, `y1` with `color`."""
+        x0, x1 = max(x0, 0), min(x1, self.width)
+        if x1 <= x0:
+            return
+        row = bytes(color) * (x1 - x0)
+        for y in range(max(y0, 0), min(y1, self.height)):
+            start = (y * self.width + x0) * 3
+            self.pixels[start:start + len(row)] = row
+
+    def fill_span(self, x: int, top: float, bottom: float, color: Color, alpha: float):
+        """Blend `color` over the column `x` between the fractional rows `top` and `bottom`, anti-aliasing both ends."""
+        top, bottom = max(top, 0), min(bottom, self.height)
+        if not 0 <= x < self.width or bottom <= top:
+            return
+        first, last = int(top), int(bottom)
+        if first == last:
+            self.blend(x, first, color, alpha * (bottom - top))
+            return
+        self.blend(x, first, color, alpha * (first + 1 - top))
+        if last > first + 1:
+            # blend the whole run of rows in between per channel, through a strided slice of the pixels
+            step = self.width * 3
+            for channel in range(3):
+                start = ((first + 1) * self.width + x) * 3 + channel
+                stop = (last * self.width + x) * 3 + channel
+                self.pixels[start:stop:step] = self.pixels[start:stop:step].translate(
+                    get_blend_table(color[channel], alpha))
+        if bottom > last:
+            self.blend(x, last, color, alpha * (bottom - last))
+
+    def draw_text(self, x: int, y: int, text: str, color: Color, scale: int = FONT_SCALE):
+        """
+        Draw `text` with its top left corner at `x`, `y`.
+        Accented letters are drawn without their accents, other characters outside of printable ascii show as `?`.
+        """
+        for char in strip_accents(text):
+            code = ord(char) if 32 <= ord(char) < 127 else ord('?')
+            glyph = FONT[(code - 32) * GLYPH_WIDTH:(code - 31) * GLYPH_WIDTH]
+            for col, bits in enumerate(glyph):
+                for row in range(GLYPH_HEIGHT):
+                    if bits >> row & 1:
+                        self.fill_rect(x + col * scale, y + row * scale,
+                                       x + (col + 1) * scale, y + (row + 1) * scale, color)
+            x += (GLYPH_WIDTH + 1) * scale
+
+    def to_png(self) -> bytes:
+        """Encode the canvas as an 8 bit RGB png."""
+        stride = self.width * 3
+        raw = b''.join(b'\x00' + self.pixels[y * stride:(y + 1) * stride] for y in range(self.height))
+        header = struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0)
+        return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header) + png_chunk(b'IDAT', zlib.compress(raw))
+                + png_chunk(b'IEND', b''))
+
+
+@lru_cache(maxsize=64)
+def get_blend_table(component: int, alpha: float) -> bytes:
+    """Get the `bytes.translate` table that blends a color channel with `component` at opacity `alpha`."""
+    return bytes(round(old + (component - old) * alpha) for old in range(256))
+
+
+def strip_accents(text: str) -> str:
+    """Get `text` with the accents of its letters removed."""
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    """Frame `data` as a png chunk of type `kind`."""
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def get_text_width(text: str, scale: int = FONT_SCALE) -> int:
+    """Get the width in pixels of `text` drawn by `Canvas.draw_text`."""
+    return len(strip_accents(text)) * (GLYPH_WIDTH + 1) * scale - scale
+
+
+def layout_nodes(data: SankeyData, width: int, height: int) -> Tuple[Dict[int, Box], Dict[int, int], float]:
+    """
+    Place the nodes that have a positive link in columns by their distance from the sources, with sinks in the
+    last column, stacked and centered vertically. Get each node's box and column, and the pixels per unit of value.
+    """
+    links = [(source, target, value) for source, target, value in zip(data.source, data.target, data.value)
+             if value > 0]
+    nodes = sorted({node for source, target, _ in links for node in (source, target)})
+    inflow = dict.fromkeys(nodes, 0)
+    outflow = dict.fromkeys(nodes, 0)
+    for source, target, value in links:
+        outflow[source] += value
+        inflow[target] += value
+
+    columns = dict.fromkeys(nodes, 0)
+    for _ in nodes:
+        for source, target, _ in links:
+            columns[target] = max(columns[target], columns[source] + 1)
+    last_column = max(columns.values(), default=0)
+    for node in nodes:
+        if not outflow[node]:
+            columns[node] = last_column
+
+    stacks: Dict[int, List[int]] = {}
+    for node in nodes:
+        stacks.setdefault(columns[node], []).append(node)
+    plot_width = width - 2 * MARGIN - NODE_THICKNESS
+    plot_height = height - 2 * MARGIN
+    max_stack = max((len(stack) for stack in stacks.values()), default=1)
+    pad = min(NODE_PAD, plot_height / 2 / (max_stack - 1)) if max_stack > 1 else 0
+    scale = min(((plot_height - pad * (len(stack) - 1)) / sum(max(inflow[node], outflow[node]) for node in stack)
+                 for stack in stacks.values()), default=0)
+
+    boxes = {}
+    for column, stack in stacks.items():
+        x = MARGIN + (plot_width * column / last_column if last_column else 0)
+        heights = [max(inflow[node], outflow[node]) * scale for node in stack]
+        y = MARGIN + (plot_height - sum(heights) - pad * (len(stack) - 1)) / 2
+        for node, node_height in zip(stack, heights):
+            boxes[node] = Box(x, y, x + NODE_THICKNESS, y + node_height)
+            y += node_height + pad
+    return boxes, columns, scale
+
+
+def render_sankey(data: SankeyData, width: int = WIDTH, height: int = HEIGHT) -> Canvas:
+    """Draw the sankey diagram of `data`, links are stacked at each node in the order they are given."""
+    canvas = Canvas(width, height)
+    boxes, columns, scale = layout_nodes(data, width, height)
+    out_offsets = {node: box.y0 for node, box in boxes.items()}
+    in_offsets = dict(out_offsets)
+    for source, target, value in zip(data.source, data.target, data.value):
+        if value <= 0:
+            continue
+        link_height = value * scale
+        source_top, target_top = out_offsets[source], in_offsets[target]
+        out_offsets[source] += link_height
+        in_offsets[target] += link_height
+        x0, x1 = boxes[source].x1, boxes[target].x0
+        for x in range(int(x0), ceil(x1)):
+            # smoothstep between the two ends gives the usual s shaped ribbon
+            t = min(max((x + 0.5 - x0) / (x1 - x0), 0), 1)
+            top = source_top + (target_top - source_top) * t * t * (3 - 2 * t)
+            canvas.fill_span(x, top, top + link_height, LINK_COLOR, LINK_ALPHA)
+
+    last_column = max(columns.values(), default=0)
+    text_height = GLYPH_HEIGHT * FONT_SCALE
+    for node, box in boxes.items():
+        canvas.fill_rect(round(box.x0), round(box.y0), round(box.x1), max(round(box.y1), round(box.y0) + 1),
+                         NODE_COLORS[node % len(NODE_COLORS)])
+        label = data.label[node]
+        y = round((box.y0 + box.y1 - text_height) / 2)
+        if columns[node] == last_column and last_column:
+            canvas.draw_text(round(box.x0) - LABEL_GAP - get_text_width(label), y, label, TEXT_COLOR)
+        else:
+            canvas.draw_text(round(box.x1) + LABEL_GAP, y, label, TEXT_COLOR)
+    return canvas
+
+
+def write_sankey_png(data: SankeyData, path: str, width: int = WIDTH, height: int = HEIGHT):
+    """Render the sankey diagram of `data` and write it to `path` as a png."""
+    with open(path, 'wb') as f:
+        f.write(render_sankey(data, width, height).to_png())
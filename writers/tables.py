@@ -1,23 +1,17 @@
-from typing import Dict
+from typing import Dict, Iterator, Mapping, Tuple
 from xlsxwriter import utility
+from finance_data import cents_to_dollars
 from writers.styles import Styles
 
 
-class Cell:
-    """Stores xlsx cell data including coordinates, value, and format."""
-
-    def __init__(self, row: int, col: int, value: str | float, format: Dict[str, str] = None):
-        self.row = row
-        self.col = col
-        self.value = value
-        self.format = format
-
-    def __str__(self) -> str:
-        return "Cell(row: {}, col: {}, value: {}, format: {}".format(self.row, self.col, self.value, self.format)
-
-
 class Series:
-    """Stores xlsx column data including coordinates, cells, and cell formats."""
+    """
+    Stores xlsx column data including coordinates, cells, and cell formats.
+    Cells are stored as parallel lists of values and format types from the header row down,
+    the format `dict`s are shared by every cell of the series through `formats`.
+    """
+
+    __slots__ = ('start_row', 'col', 'category', 'formats', 'values', 'format_types')
 
     def __init__(self, start_row: int, col: int, category: str, styles: Styles, use_empty_header: bool = False):
         self.start_row = start_row
@@ -25,14 +19,12 @@ class Series:
         self.category = category
         self.formats = styles.get(category)
         header_text = '' if use_empty_header else category
-        self.header_cell = Cell(start_row, col, header_text, self.get_format('header'))
-        self.data: list[Cell] = []
-        self.sum_cell = None
+        self.values: list[str | float] = [header_text]
+        self.format_types: list[str] = ['header']
 
     def __str__(self) -> str:
-        cells_str = ",".join([str(cell) for cell in self.get_cells_as_list])
-        return "Series(start_row: {}, col: {}, category: {}, formats: {}, cells: {})".format(
-            self.start_row, self.col, self.category, self.formats, cells_str)
+        return "Series(start_row: {}, col: {}, category: {}, formats: {}, values: {}, format_types: {})".format(
+            self.start_row, self.col, self.category, self.formats, self.values, self.format_types)
 
     def get_format(self, format_type: str) -> Dict[str, str]:
         """Get the format `dict` for the given `format_type` from this series' formats."""
@@ -44,55 +36,55 @@ class Series:
 
     def get_height(self) -> int:
         """Get the column's height."""
-        if self.sum_cell:
-            return 1 + len(self.data) + 1
-        else:
-            return 1 + len(self.data)
-
-    def get_cells_as_list(self) -> list[Cell]:
-        """Get all cells in the series as a list. Includes header, data, and sum cells."""
-        cell_list = [self.header_cell]
-        cell_list.extend(self.data)
-        if self.sum_cell:
-            cell_list.append(self.sum_cell)
-        return cell_list
+        return len(self.values)
+
+    def get_next_row(self) -> int:
+        """Get the row of the next cell appended to the series."""
+        return self.start_row + len(self.values)
+
+    def append_cell(self, value: str | float, format_type: str):
+        """Append a cell containing `value` with the format for `format_type` below the last cell."""
+        self.values.append(value)
+        self.format_types.append(format_type)
 
     def append_data_cell(self, value: str | float, cell_type: str = 'data'):
         """
         Append a data cell containing `value` to this series' data.
         Optionally specify `cell_type` to use for the cell's format. Default is `data` or `alt` depending on row index.
         """
-        row = self.start_row + len(self.data) + 1
-        if cell_type == 'data' and row % 2 == 0:
+        if cell_type == 'data' and self.get_next_row() % 2 == 0:
             cell_type = 'alt'
-        self.data.append(Cell(row, self.col, value, self.get_format(cell_type)))
+        self.append_cell(value, cell_type)
+
+    def extend_data_cells(self, values: list[str | float]):
+        """Append a data cell for each of `values`, alternating between `data` and `alt` formats by row index."""
+        next_row = self.get_next_row()
+        self.values.extend(values)
+        self.format_types.extend('alt' if row % 2 == 0 else 'data' for row in range(next_row, next_row + len(values)))
 
     def append_sum_row_cell(self, start_col: int, end_col: int):
         """Append a data cell containing the SUM formula for all columns between `start_col` and `end_col`."""
-        row = self.start_row + len(self.data) + 1
-        xl_row = row + 1
+        xl_row = self.get_next_row() + 1
         xl_start_col = utility.xl_col_to_name(start_col)
         xl_end_col = utility.xl_col_to_name(end_col)
         sum_formula = '=SUM({}{}:{}{})'.format(xl_start_col, xl_row, xl_end_col, xl_row)
-        self.data.append(Cell(row, self.col, sum_formula, self.get_format('total')))
+        self.append_cell(sum_formula, 'total')
 
     def append_difference_row_cell(self, col1_index: int, col2_index: int):
         """Append a data cell containing a subtraction formula for the columns `col1_index` and `col2_index`."""
-        row = self.start_row + len(self.data) + 1
-        xl_row = row + 1
+        xl_row = self.get_next_row() + 1
         xl_col1 = utility.xl_col_to_name(col1_index)
         xl_col2 = utility.xl_col_to_name(col2_index)
         diff_formula = '={}{}-{}{}'.format(xl_col1, xl_row, xl_col2, xl_row)
-        self.data.append(Cell(row, self.col, diff_formula, self.get_format('total')))
+        self.append_cell(diff_formula, 'total')
 
     def create_sum_cell(self):
         """Create a cell that contains the SUM formula for the rows in this column."""
-        row = self.start_row + len(self.data) + 1
         xl_start_sum_row = self.start_row + 2
-        xl_end_sum_row = self.start_row + len(self.data) + 1
+        xl_end_sum_row = self.get_next_row()
         xl_sum_col = utility.xl_col_to_name(self.col)
         sum_formula = '=SUM({}{}:{}{})'.format(xl_sum_col, xl_start_sum_row, xl_sum_col, xl_end_sum_row)
-        self.sum_cell = Cell(row, self.col, sum_formula, self.get_format('total'))
+        self.append_cell(sum_formula, 'total')
 
 
 class Table:
@@ -104,8 +96,7 @@ class Table:
         self.timespans = list(data.keys())
         self.timespan_col = Series(start_row, start_col, 'timespan', styles, use_empty_header=True)
 
-        for timespan in self.timespans:
-            self.timespan_col.append_data_cell(timespan)
+        self.timespan_col.extend_data_cells(self.timespans)
 
     def get_num_data_rows(self) -> int:
         """Get number of rows in the table containing data. Does not include header or sum rows."""
@@ -119,22 +110,34 @@ class Table:
         """Get total width of the table."""
         pass
 
-    def get_cols_as_lists(self) -> list[list[Cell]]:
-        """Get all columns in the table represented as lists of cells."""
+    def get_series_list(self) -> list[Series]:
+        """Get all columns in the table as series, from left to right."""
         pass
 
+    def get_rows(self) -> Iterator[Tuple[int, list[str | float], list[str]]]:
+        """
+        Get the rows of the table from top to bottom as `(row, values, format_types)`,
+        with one entry per series of `get_series_list` in each row.
+        """
+        series_list = self.get_series_list()
+        for index in range(self.get_height()):
+            yield (self.start_row + index,
+                   [series.values[index] for series in series_list],
+                   [series.format_types[index] for series in series_list])
+
 
 class ExpensesTable(Table):
     """
     Converts an expenses dictionary to a `Table`
 
-    Expenses should take the form of `{ timespan: { category: value } }`
+    Expenses should take the form of `{ timespan: { category: value } }` with values in cents,
+    any read-only mapping such as the views returned by `FinanceData` works
     """
 
     def __init__(self,
                  start_row: int,
                  start_col: int,
-                 expenses: Dict[str, Dict[str, float]],
+                 expenses: Mapping[str | int, Mapping[str, int]],
                  styles: Styles,
                  include_sum_row: bool = True):
         super().__init__(start_row, start_col, expenses, styles)
@@ -142,8 +145,7 @@ class ExpensesTable(Table):
         self.columns: list[Series] = []
         for col_index, category in enumerate(expenses[self.timespans[0]].keys(), start=start_col + 1):
             col = Series(start_row, col_index, category, styles)
-            for time in self.timespans:
-                col.append_data_cell(expenses[time][category])
+            col.extend_data_cells([cents_to_dollars(expenses[time][category]) for time in self.timespans])
             self.columns.append(col)
 
         if include_sum_row:
@@ -153,12 +155,9 @@ class ExpensesTable(Table):
         """Get total width of the table."""
         return len(self.columns) + 1
 
-    def get_cols_as_lists(self) -> list[list[Cell]]:
-        """Get all columns in the table represented as lists of cells."""
-        all_columns = [self.timespan_col.get_cells_as_list()]
-        for col in self.columns:
-            all_columns.append(col.get_cells_as_list())
-        return all_columns
+    def get_series_list(self) -> list[Series]:
+        """Get all columns in the table as series, from left to right."""
+        return [self.timespan_col] + self.columns
 
     def get_series_for_expenses_chart(self) -> list[Series]:
         """Get the series used in an expenses chart."""
@@ -175,13 +174,13 @@ class OverallTable(Table):
     """
     Converts an overall data dictionary to a `Table`
 
-    Data should take the form of `{ timespan: { major_category: { minor_category: value } } }`
+    Data should take the form of `{ timespan: { major_category: { minor_category: value } } }` with values in cents
     """
 
     def __init__(self,
                  start_row: int,
                  start_col: int,
-                 overall_data: Dict[str, Dict[str, Dict[str, float]]],
+                 overall_data: Dict[str, Dict[str, Dict[str, int]]],
                  styles: Styles,
                  include_sum_row: bool = True):
         super().__init__(start_row, start_col, overall_data, styles)
@@ -192,8 +191,8 @@ class OverallTable(Table):
         self.income_series: list[Series] = []
         for category in overall_data[timespan]['income'].keys():
             col = Series(start_row, col_index, category, styles)
-            for time in self.timespans:
-                col.append_data_cell(overall_data[time]['income'][category])
+            col.extend_data_cells(
+                [cents_to_dollars(overall_data[time]['income'][category]) for time in self.timespans])
             self.income_series.append(col)
             col_index += 1
 
@@ -207,8 +206,8 @@ class OverallTable(Table):
         self.expenses_series: list[Series] = []
         for category in overall_data[timespan]['expenses'].keys():
             col = Series(start_row, col_index, category, styles)
-            for time in self.timespans:
-                col.append_data_cell(overall_data[time]['expenses'][category])
+            col.extend_data_cells(
+                [cents_to_dollars(overall_data[time]['expenses'][category]) for time in self.timespans])
             self.expenses_series.append(col)
             col_index += 1
 
@@ -227,16 +226,16 @@ class OverallTable(Table):
         self.transfers_series: list[Series] = []
         for category in overall_data[timespan]['transfers'].keys():
             col = Series(start_row, col_index, category, styles)
-            for time in self.timespans:
-                col.append_data_cell(overall_data[time]['transfers'][category])
+            col.extend_data_cells(
+                [cents_to_dollars(overall_data[time]['transfers'][category]) for time in self.timespans])
             self.transfers_series.append(col)
             col_index += 1
 
         self.unknown_series: list[Series] = []
         for category in overall_data[timespan]['unknown'].keys():
             col = Series(start_row, col_index, category, styles)
-            for time in self.timespans:
-                col.append_data_cell(overall_data[time]['unknown'][category])
+            col.extend_data_cells(
+                [cents_to_dollars(overall_data[time]['unknown'][category]) for time in self.timespans])
             self.unknown_series.append(col)
             col_index += 1
 
@@ -248,21 +247,17 @@ class OverallTable(Table):
         return (1 + len(self.income_series) + len(self.expenses_series) + len(self.transfers_series)
                 + len(self.unknown_series) + 3)
 
-    def get_cols_as_lists(self) -> list[list[Cell]]:
-        """Get all columns in the table represented as lists of cells."""
-        all_columns = [self.timespan_col.get_cells_as_list()]
-        for col in self.income_series:
-            all_columns.append(col.get_cells_as_list())
-        all_columns.append(self.total_income_series.get_cells_as_list())
-        for col in self.expenses_series:
-            all_columns.append(col.get_cells_as_list())
-        all_columns.append(self.total_expenses_series.get_cells_as_list())
-        all_columns.append(self.total_surplus_series.get_cells_as_list())
-        for col in self.transfers_series:
-            all_columns.append(col.get_cells_as_list())
-        for col in self.unknown_series:
-            all_columns.append(col.get_cells_as_list())
-        return all_columns
+    def get_series_list(self) -> list[Series]:
+        """Get all columns in the table as series, from left to right."""
+        all_series = [self.timespan_col]
+        all_series.extend(self.income_series)
+        all_series.append(self.total_income_series)
+        all_series.extend(self.expenses_series)
+        all_series.append(self.total_expenses_series)
+        all_series.append(self.total_surplus_series)
+        all_series.extend(self.transfers_series)
+        all_series.extend(self.unknown_series)
+        return all_series
 
     def get_series_for_income_expenses_chart(self) -> list[Series]:
         """Get the series used in a cahrt of incomes and expenses."""
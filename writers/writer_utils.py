@@ -1,28 +1,85 @@
+from typing import Any, Dict, Hashable, Iterator, Tuple
+from weakref import WeakKeyDictionary
+
 from xlsxwriter import Workbook, utility
-from writers.tables import Table, Series, Cell
+from xlsxwriter.format import Format
+from writers.tables import Table, Series
 
 Worksheet = Workbook.worksheet_class
 
+# frozen style and shrink flag of each format already added to a workbook
+FormatKey = Tuple[Hashable, bool]
+format_caches: 'WeakKeyDictionary[Workbook, Dict[FormatKey, Format]]' = WeakKeyDictionary()
+
+
+def freeze_style(style: Any) -> Hashable:
+    """Get a hashable form of a style `dict`, independent of key order."""
+    if isinstance(style, dict):
+        return tuple(sorted((key, freeze_style(value)) for key, value in style.items()))
+    if isinstance(style, list):
+        return tuple(freeze_style(value) for value in style)
+    # keep values that compare equal but are different formats apart, such as `1` and `True`
+    return type(style).__name__, style
+
 
-def write_cell(workbook: Workbook, worksheet: Worksheet, cell: Cell):
-    """Write `cell` to `worksheet`."""
-    format = workbook.add_format(cell.format)
-    # TODO: setup default and custom formats for cells
-    format.set_shrink()
-    worksheet.write(cell.row, cell.col, cell.value, format)
+def get_format(workbook: Workbook, style: Dict[str, str] | None, shrink: bool = True) -> Format:
+    """Get the format for `style` in `workbook`, adding it only the first time the style is used."""
+    formats = format_caches.setdefault(workbook, {})
+    key = freeze_style(style), shrink
+    format = formats.get(key)
+    if format is None:
+        format = workbook.add_format(style)
+        if shrink:
+            format.set_shrink()
+        formats[key] = format
+    return format
 
 
-def write_list_of_cells(workbook: Workbook, worksheet: Worksheet, cells: list[Cell]):
-    """Write each cell in `cells` to `worksheet`."""
-    for cell in cells:
-        write_cell(workbook, worksheet, cell)
+def get_series_formats(workbook: Workbook, series: Series) -> Dict[str, Format]:
+    """Get the format in `workbook` for each format type used by `series`."""
+    return {format_type: get_format(workbook, series.get_format(format_type))
+            for format_type in set(series.format_types)}
 
 
 def write_table(workbook: Workbook, worksheet: Worksheet, table: Table):
-    """Write the contents of `table` to `worksheet`."""
-    table_cols = table.get_cols_as_lists()
-    for col in table_cols:
-        write_list_of_cells(workbook, worksheet, col)
+    """
+    Write the contents of `table` to `worksheet` row by row, from top to bottom,
+    so that a workbook in `constant_memory` mode can flush each row once it is complete.
+    Each run of adjacent cells in a row that share a format is written with a single `write_row`,
+    a cell on its own with the writer for its type.
+    """
+    series_list = table.get_series_list()
+    series_formats = [get_series_formats(workbook, series) for series in series_list]
+    cols = [series.col for series in series_list]
+    for row, values, format_types in table.get_rows():
+        formats = [formats[format_type] for format_type, formats in zip(format_types, series_formats)]
+        for start, end in get_format_runs(cols, formats):
+            if end - start > 1:
+                worksheet.write_row(row, cols[start], values[start:end], formats[start])
+            else:
+                write_value(worksheet, row, cols[start], values[start], formats[start])
+
+
+def write_value(worksheet: Worksheet, row: int, col: int, value: str | float, format: Format):
+    """Write a single table `value` with the writer for its type, skipping the type checks of `worksheet.write`."""
+    if not isinstance(value, str):
+        worksheet.write_number(row, col, value, format)
+    elif value.startswith('='):
+        worksheet.write_formula(row, col, value, format)
+    elif value and ':' not in value:
+        worksheet.write_string(row, col, value, format)
+    else:
+        # blank cells, and strings that `write` may turn into urls
+        worksheet.write(row, col, value, format)
+
+
+def get_format_runs(cols: list[int], formats: list[Format]) -> Iterator[Tuple[int, int]]:
+    """Get the `(start, end)` index ranges of adjacent columns in `cols` whose cells share the same format."""
+    start = 0
+    for index in range(1, len(cols) + 1):
+        if index == len(cols) or formats[index] is not formats[start] or cols[index] != cols[index - 1] + 1:
+            yield start, index
+            start = index
 
 
 def create_line_chart_for_table(workbook: Workbook,